@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# Helpers shared by the *_bench.py scripts: the HTTP server their fakes run on and latency percentiles.
+import math
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer for fake API servers under benchmark load."""
+    # The default backlog of 5 overflows with many concurrent clients, and every overflowed
+    # connect waits out a ~1 s SYN retry, so the benchmark would mostly measure the fake server
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """Keep-alive request handler base for fake API servers; does not log requests."""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY, delayed ACKs add ~40ms per response
+    disable_nagle_algorithm = True
+
+    def send_body(self, status: int, body: bytes, content_type: str = 'application/json') -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """Return nearest-rank p50/p95/p99 and the max of a list of latencies, in milliseconds."""
+    ordered = sorted(latencies)
+    if not ordered:
+        return {}
+
+    def pick(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(math.ceil(p / 100 * len(ordered))) - 1)] * 1000, 3)
+
+    return {'p50_ms': pick(50), 'p95_ms': pick(95), 'p99_ms': pick(99), 'max_ms': round(ordered[-1] * 1000, 3)}
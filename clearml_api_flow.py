@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 
 import os
+import asyncio
+import bisect
+import csv
+import importlib
 import json
 import random
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 import time
+import threading
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Iterator, AsyncIterator, Tuple
+from concurrent.futures import ThreadPoolExecutor
 
 
 # Configure logging
@@ -22,12 +30,187 @@ def generate_random_suffix() -> str:
     return f"{random.randint(0, 999):03d}"
 
 
+# Task statuses that end a wait for the task to start
+STARTED_STATUSES = ("in_progress", "completed", "failed")
+
+# Maximum number of task IDs sent in one tasks.get_all call
+STATUS_BATCH_SIZE = 500
+
+# Responses worth retrying: the server or a proxy in front of it is temporarily unavailable
+RETRY_STATUSES = (502, 503, 504)
+
+# Calls that create something or add a task to a queue. A timeout or a 502/504 can arrive after the
+# server already did the work, so retrying them could create a duplicate task or enqueue it twice;
+# they are only retried when the server cannot have processed the request: a failed connect or a 503.
+NON_IDEMPOTENT_ENDPOINTS = ("tasks.create", "tasks.enqueue", "projects.create", "queues.create")
+NON_IDEMPOTENT_RETRY_STATUSES = (503,)
+
+
+def _login_headers(webserver_url: str, basic_auth: str) -> Dict[str, str]:
+    """Headers for auth.login, mimicking the ClearML web app."""
+    return {
+        "Authorization": f"Basic {basic_auth}",
+        "Origin": webserver_url,
+        "Referer": f"{webserver_url}/login",
+        "X-Allegro-Client": "Webapp-1.16.2-502",
+        "X-Clearml-Impersonate-As": "__tests__"
+    }
+
+
+def _token_headers(token: str) -> Dict[str, str]:
+    """Headers that authenticate API calls with a login token."""
+    return {
+        "Cookie": f"clearml-token-k8s={token}",
+        "Content-Type": "application/json"
+    }
+
+
+def _connect_failed(error: requests.exceptions.RequestException) -> bool:
+    """Whether a request failed while connecting, i.e. before anything was sent to the server."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+def _pop_started(pending: Dict[str, Optional[str]], statuses: Dict[str, str]) -> List[Tuple[str, str]]:
+    """Record the latest status of each pending task and remove and return the ones that started."""
+    started = []
+    for task_id in list(pending):
+        status = statuses.get(task_id, "unknown")
+        pending[task_id] = status
+        if status in STARTED_STATUSES:
+            del pending[task_id]
+            started.append((task_id, status))
+    return started
+
+
+class ApiMetrics:
+    """Per-endpoint call counts, errors, bytes and latency histograms for ClearML API calls.
+
+    Every HTTP attempt is recorded, retries included. Clients only time calls when given an
+    ApiMetrics instance, so leaving it out costs one attribute check per call.
+    """
+    
+    # Latency histogram bucket upper bounds, in seconds
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self):
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, endpoint: str, seconds: float, status: int, bytes_sent: int, bytes_received: int) -> None:
+        """Record one HTTP attempt; status 0 means the request failed without a response."""
+        bucket = bisect.bisect_left(self.BUCKETS, seconds)
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    "count": 0, "errors": 0, "bytes_sent": 0, "bytes_received": 0,
+                    "seconds": 0.0, "max_seconds": 0.0, "buckets": [0] * (len(self.BUCKETS) + 1)
+                }
+            stats["count"] += 1
+            stats["errors"] += status == 0 or status >= 400
+            stats["bytes_sent"] += bytes_sent
+            stats["bytes_received"] += bytes_received
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["buckets"][bucket] += 1
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return a copy of the per-endpoint statistics."""
+        with self._lock:
+            return {endpoint: {**stats, "buckets": list(stats["buckets"])}
+                    for endpoint, stats in self._endpoints.items()}
+    
+    def _quantile(self, buckets: List[int], count: int, q: float) -> float:
+        """Estimate a latency quantile as the upper bound of the bucket that contains it."""
+        rank = q * count
+        seen = 0
+        for bound, bucket_count in zip(self.BUCKETS, buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+    
+    def summary_lines(self) -> List[str]:
+        """Format one line per endpoint, slowest total time first."""
+        lines = [f"{'ENDPOINT':<18} {'CALLS':>6} {'ERRORS':>6} {'TOTAL':>9} {'MEAN':>8} {'P95<=':>7} "
+                 f"{'MAX':>8} {'SENT':>10} {'RECEIVED':>10}"]
+        stats_by_endpoint = sorted(self.snapshot().items(), key=lambda item: item[1]["seconds"], reverse=True)
+        for endpoint, stats in stats_by_endpoint:
+            mean = stats["seconds"] / stats["count"]
+            p95 = self._quantile(stats["buckets"], stats["count"], 0.95)
+            lines.append(f"{endpoint:<18} {stats['count']:>6} {stats['errors']:>6} {stats['seconds']:>8.3f}s "
+                         f"{mean * 1000:>6.1f}ms {p95:>6g}s {stats['max_seconds'] * 1000:>6.1f}ms "
+                         f"{stats['bytes_sent']:>10} {stats['bytes_received']:>10}")
+        return lines
+    
+    def to_prometheus(self, prefix: str = "clearml_api") -> str:
+        """Render the statistics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_requests_total ClearML API HTTP attempts.",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        lines += [f'{prefix}_requests_total{{endpoint="{e}"}} {s["count"]}' for e, s in snapshot.items()]
+        lines += [f"# HELP {prefix}_errors_total ClearML API attempts that failed or returned HTTP >= 400.",
+                  f"# TYPE {prefix}_errors_total counter"]
+        lines += [f'{prefix}_errors_total{{endpoint="{e}"}} {s["errors"]}' for e, s in snapshot.items()]
+        for direction in ("sent", "received"):
+            lines += [f"# HELP {prefix}_bytes_{direction}_total ClearML API body bytes {direction}.",
+                      f"# TYPE {prefix}_bytes_{direction}_total counter"]
+            lines += [f'{prefix}_bytes_{direction}_total{{endpoint="{e}"}} {s["bytes_" + direction]}'
+                      for e, s in snapshot.items()]
+        lines += [f"# HELP {prefix}_request_duration_seconds ClearML API attempt latency.",
+                  f"# TYPE {prefix}_request_duration_seconds histogram"]
+        for endpoint, stats in snapshot.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.BUCKETS + (float("inf"),), stats["buckets"]):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats["seconds"]}')
+            lines.append(f'{prefix}_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats["count"]}')
+        return "\n".join(lines) + "\n"
+
+
 class ClearMLClient:
-    def __init__(self, webserver_url: str, basic_auth: str, debug: bool = False):
+    def __init__(self, webserver_url: str, basic_auth: str, debug: bool = False,
+                 pool_size: int = 10, max_retries: int = 3, backoff: float = 0.5, timeout: float = 30,
+                 lookup_ttl: float = 300, metrics: Optional[ApiMetrics] = None):
+        """Create a client whose API calls share one pooled keep-alive session.
+
+        Calls rejected with 401 log in again once and are replayed with the new token. Calls that
+        fail with a 502/503/504 or a connection error or timeout are retried up to max_retries times
+        with jittered exponential backoff; creating and enqueueing calls only after a failed connect
+        or a 503, so a retry cannot repeat them. Queue and project name lookups are served from an in-memory
+        index that is rebuilt after lookup_ttl seconds or when a queue/project is created. Pass an
+        ApiMetrics instance to record per-endpoint call statistics. Tasks created by this client are
+        tracked until they are enqueued, so enqueue_task can skip the checks that only existing
+        tasks need.
+        """
         self.webserver_url = webserver_url
+        self.api_url = f"{webserver_url}/api/v2.30"
         self.basic_auth = basic_auth
         self.token = None
         self.headers = {}
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._login_lock = threading.Lock()
+        self.metrics = metrics
+        self.lookup_ttl = lookup_ttl
+        # kind ("queues"/"projects") -> (monotonic fetch time, items, name -> ID index)
+        self._lookups: Dict[str, tuple] = {}
+        self._lookup_lock = threading.Lock()
+        # task ID -> execution queue, for tasks created by this client and not enqueued since
+        self._known_tasks: Dict[str, Optional[str]] = {}
+        
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         
         if debug:
             # Enable request/response debugging
@@ -39,31 +222,86 @@ class ClearMLClient:
 
     def login(self) -> str:
         """Authenticate with ClearML server and get token."""
-        login_url = f"{self.webserver_url}/api/v2.30/auth.login"
-        headers = {
-            "Authorization": f"Basic {self.basic_auth}",
-            "Origin": self.webserver_url,
-            "Referer": f"{self.webserver_url}/login",
-            "X-Allegro-Client": "Webapp-1.16.2-502",
-            "X-Clearml-Impersonate-As": "__tests__"
-        }
+        login_url = f"{self.api_url}/auth.login"
+        headers = _login_headers(self.webserver_url, self.basic_auth)
         
         logger.info(f"Authenticating with ClearML server at {self.webserver_url}")
-        response = requests.post(login_url, headers=headers)
+        response = self._send("POST", login_url, headers=headers)
         response.raise_for_status()
         
         self.token = response.json()["data"]["token"]
-        self.headers = {
-            "Cookie": f"clearml-token-k8s={self.token}",
-            "Content-Type": "application/json"
-        }
+        self.headers = _token_headers(self.token)
         
         logger.info("Authentication successful - token received")
         return self.token
     
+    def close(self) -> None:
+        """Close the underlying session and its pooled connections."""
+        self.session.close()
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff: a random delay up to backoff * 2^attempt."""
+        return random.uniform(0, self.backoff * (2 ** attempt))
+    
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request, retrying transient 5xx responses and connection errors."""
+        idempotent = url.rsplit("/", 1)[-1] not in NON_IDEMPOTENT_ENDPOINTS
+        retry_statuses = RETRY_STATUSES if idempotent else NON_IDEMPOTENT_RETRY_STATUSES
+        attempt = 0
+        while True:
+            try:
+                if self.metrics is None:
+                    response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                else:
+                    response = self._timed_request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.max_retries or not (idempotent or _connect_failed(e)):
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"{method} {url} failed ({e}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in retry_statuses or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+            attempt += 1
+            time.sleep(delay)
+    
+    def _timed_request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send one HTTP attempt and record it in self.metrics."""
+        endpoint = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            self.metrics.observe(endpoint, time.perf_counter() - started, 0, 0, 0)
+            raise
+        body = response.request.body
+        self.metrics.observe(endpoint, time.perf_counter() - started, response.status_code,
+                             len(body) if body else 0, len(response.content))
+        return response
+    
+    def _relogin(self, stale_token: Optional[str]) -> None:
+        """Log in again, unless another thread already replaced the stale token."""
+        with self._login_lock:
+            if self.token == stale_token:
+                logger.info("Token rejected by the server, logging in again")
+                self.login()
+    
+    def _request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """Call an API endpoint (e.g. 'tasks.create') with the session token and raise on HTTP errors."""
+        url = f"{self.api_url}/{endpoint}"
+        token = self.token
+        response = self._send(method, url, headers=self.headers, **kwargs)
+        if response.status_code == 401:
+            self._relogin(token)
+            response = self._send(method, url, headers=self.headers, **kwargs)
+        response.raise_for_status()
+        return response
+    
     def create_project(self, project_name: str) -> str:
         """Create a new project and return its ID."""
-        url = f"{self.webserver_url}/api/v2.30/projects.create"
+        endpoint = "projects.create"
         data = {
             "name": project_name,
             "description": "test in progress",
@@ -72,144 +310,206 @@ class ClearMLClient:
         }
         
         logger.info(f"Creating project '{project_name}'")
-        response = requests.post(url, headers=self.headers, json=data)
-        response.raise_for_status()
+        response = self._request("POST", endpoint, json=data)
         
         project_id = response.json()["data"]["id"]
         logger.info(f"Created project '{project_name}' with ID: {project_id}")
+        self.invalidate_lookups("projects")
         return project_id
     
-    def get_all_queues(self) -> List[Dict[str, Any]]:
-        """Get all available queues."""
-        url = f"{self.webserver_url}/api/v2.30/queues.get_all"
+    def _lookup(self, kind: str, fetch: Callable[[], List[Dict[str, Any]]], refresh: bool = False) -> tuple:
+        """Return (items, name -> ID index) for kind, fetching them only if missing or older than lookup_ttl."""
+        with self._lookup_lock:
+            cached = self._lookups.get(kind)
+            if cached and not refresh and time.monotonic() - cached[0] < self.lookup_ttl:
+                return cached[1], cached[2]
+        items = fetch()
+        index = {item["name"]: item["id"] for item in items}
+        with self._lookup_lock:
+            self._lookups[kind] = (time.monotonic(), items, index)
+        return items, index
+    
+    def invalidate_lookups(self, kind: Optional[str] = None) -> None:
+        """Drop the cached queue/project index (or both when kind is None) so the next lookup refetches it."""
+        with self._lookup_lock:
+            if kind is None:
+                self._lookups.clear()
+            else:
+                self._lookups.pop(kind, None)
+    
+    def _fetch_all_queues(self) -> List[Dict[str, Any]]:
+        endpoint = "queues.get_all"
         
         logger.info("Retrieving all available queues")
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
+        response = self._request("GET", endpoint)
         
         queues = response.json()["data"]["queues"]
         logger.info(f"Found {len(queues)} queues")
         return queues
     
+    def get_all_queues(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """Get all available queues (cached for lookup_ttl seconds unless refresh is set)."""
+        return self._lookup("queues", self._fetch_all_queues, refresh)[0]
+    
     def get_queue_id(self, queue_name: str) -> Optional[str]:
         """Check if queue exists and return its ID if found."""
-        queues = self.get_all_queues()
-        for queue in queues:
-            if queue["name"] == queue_name:
-                logger.info(f"Found existing queue '{queue_name}' with ID: {queue['id']}")
-                return queue["id"]
-        logger.info(f"Queue '{queue_name}' not found")
-        return None
+        queue_id = self._lookup("queues", self._fetch_all_queues)[1].get(queue_name)
+        if queue_id:
+            logger.info(f"Found existing queue '{queue_name}' with ID: {queue_id}")
+        else:
+            logger.info(f"Queue '{queue_name}' not found")
+        return queue_id
+    
+    def _fetch_all_projects(self) -> List[Dict[str, Any]]:
+        endpoint = "projects.get_all"
+        data = {"only_fields": ["id", "name"]}
+        
+        logger.info("Retrieving all projects")
+        response = self._request("POST", endpoint, json=data)
+        
+        projects = response.json()["data"]["projects"]
+        logger.info(f"Found {len(projects)} projects")
+        return projects
+    
+    def get_all_projects(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """Get all projects (cached for lookup_ttl seconds unless refresh is set)."""
+        return self._lookup("projects", self._fetch_all_projects, refresh)[0]
+    
+    def get_project_id(self, project_name: str) -> Optional[str]:
+        """Check if project exists and return its ID if found."""
+        project_id = self._lookup("projects", self._fetch_all_projects)[1].get(project_name)
+        if project_id:
+            logger.info(f"Found existing project '{project_name}' with ID: {project_id}")
+        else:
+            logger.info(f"Project '{project_name}' not found")
+        return project_id
     
     def create_queue(self, queue_name: str) -> str:
         """Create a new queue and return its ID."""
-        url = f"{self.webserver_url}/api/v2.30/queues.create"
+        endpoint = "queues.create"
         data = {"name": queue_name}
         
         logger.info(f"Creating queue '{queue_name}'")
-        response = requests.post(url, headers=self.headers, json=data)
-        response.raise_for_status()
+        response = self._request("POST", endpoint, json=data)
         
         queue_id = response.json()["data"]["id"]
         logger.info(f"Created queue '{queue_name}' with ID: {queue_id}")
+        self.invalidate_lookups("queues")
         return queue_id
     
-    def create_task(self, task_config: Dict[str, Any]) -> str:
-        """Create a new task and return its ID."""
-        url = f"{self.webserver_url}/api/v2.30/tasks.create"
+    def create_task(self, task_config: Dict[str, Any], queue_id: Optional[str] = None) -> str:
+        """Create a new task, optionally with its execution queue already set, and return its ID."""
+        endpoint = "tasks.create"
+        if queue_id:
+            task_config = {**task_config, "execution": {**task_config.get("execution", {}), "queue": queue_id}}
         
         logger.info(f"Creating task '{task_config['name']}'")
-        response = requests.post(url, headers=self.headers, json=task_config)
-        response.raise_for_status()
+        response = self._request("POST", endpoint, json=task_config)
         
         task_id = response.json()["data"]["id"]
+        self._known_tasks[task_id] = queue_id
         logger.info(f"Created task '{task_config['name']}' with ID: {task_id}")
         return task_id
     
+    def create_and_enqueue_task(self, task_config: Dict[str, Any], queue_id: str) -> str:
+        """Create a task with its queue set and enqueue it in two API calls, returning its ID."""
+        task_id = self.create_task(task_config, queue_id=queue_id)
+        self.enqueue_task(queue_id, task_id)
+        return task_id
+    
     def update_task(self, task_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Update task properties."""
-        url = f"{self.webserver_url}/api/v2.30/tasks.edit"
+        endpoint = "tasks.edit"
         payload = {
             "task": task_id,
             **data
         }
         
         logger.info(f"Updating task {task_id} with new properties: {json.dumps(data)}")
-        response = requests.post(url, headers=self.headers, json=payload)
-        response.raise_for_status()
+        response = self._request("POST", endpoint, json=payload)
         
+        if "execution" in data and task_id in self._known_tasks:
+            self._known_tasks[task_id] = data["execution"].get("queue")
         logger.info(f"Updated task {task_id}")
         return response.json()
     
     def reset_task(self, task_id: str) -> Dict[str, Any]:
         """Reset task status to 'created'."""
-        url = f"{self.webserver_url}/api/v2.30/tasks.reset"
+        endpoint = "tasks.reset"
         data = {"task": task_id}
         
         logger.info(f"Resetting task {task_id}")
-        response = requests.post(url, headers=self.headers, json=data)
-        response.raise_for_status()
+        self._known_tasks.pop(task_id, None)
+        response = self._request("POST", endpoint, json=data)
         
         logger.info(f"Reset task {task_id}")
         return response.json()
     
     def stop_task(self, task_id: str) -> Dict[str, Any]:
         """Stop a running task."""
-        url = f"{self.webserver_url}/api/v2.30/tasks.stop"
+        endpoint = "tasks.stop"
         data = {"task": task_id}
         
         logger.info(f"Stopping task {task_id}")
-        response = requests.post(url, headers=self.headers, json=data)
-        response.raise_for_status()
+        self._known_tasks.pop(task_id, None)
+        response = self._request("POST", endpoint, json=data)
         
         logger.info(f"Stopped task {task_id}")
         return response.json()
     
     def enqueue_task(self, queue_id: str, task_id: str) -> Dict[str, Any]:
-        """Enqueue a task and return the response."""
-        # First ensure the task is not already queued somewhere else
-        task_info = self.get_task_info(task_id)
-        current_status = task_info.get("status")
+        """Enqueue a task and return the response.
         
-        # If the task is already queued, reset it first
-        if current_status in ["queued", "in_progress"]:
-            logger.info(f"Task is already {current_status}, resetting it first")
-            try:
-                self.stop_task(task_id)
-                self.reset_task(task_id)
-            except requests.exceptions.HTTPError as e:
-                logger.warning(f"Could not reset task: {e}")
-        
-        # Set the queue directly in the task
-        logger.info(f"Setting execution queue to {queue_id} for task {task_id}")
-        self.update_task(task_id, {
-            "execution": {
-                "queue": queue_id
-            }
-        })
+        A task this client created and has not enqueued yet is known to be in 'created' status, so
+        its status check is skipped, and so is the queue update when it was created with this queue.
+        Any other task is checked, reset if it is already queued or running, and pointed at the queue.
+        """
+        fresh = task_id in self._known_tasks
+        created_queue = self._known_tasks.pop(task_id, None)
+        
+        if not fresh:
+            # First ensure the task is not already queued somewhere else
+            task_info = self.get_task_info(task_id)
+            current_status = task_info.get("status")
+            
+            # If the task is already queued, reset it first
+            if current_status in ["queued", "in_progress"]:
+                logger.info(f"Task is already {current_status}, resetting it first")
+                try:
+                    self.stop_task(task_id)
+                    self.reset_task(task_id)
+                except requests.exceptions.HTTPError as e:
+                    logger.warning(f"Could not reset task: {e}")
+        
+        if created_queue != queue_id:
+            # Set the queue directly in the task
+            logger.info(f"Setting execution queue to {queue_id} for task {task_id}")
+            self.update_task(task_id, {
+                "execution": {
+                    "queue": queue_id
+                }
+            })
         
         # Then enqueue the task
-        url = f"{self.webserver_url}/api/v2.30/tasks.enqueue"
+        endpoint = "tasks.enqueue"
         data = {
             "queue": queue_id,
             "task": task_id
         }
         
         logger.info(f"Enqueueing task {task_id} to queue {queue_id}")
-        response = requests.post(url, headers=self.headers, json=data)
-        response.raise_for_status()
+        response = self._request("POST", endpoint, json=data)
         
         logger.info(f"Task {task_id} enqueued to queue {queue_id}")
         return response.json()
     
     def get_task_info(self, task_id: str) -> Dict[str, Any]:
         """Get detailed information about a task."""
-        url = f"{self.webserver_url}/api/v2.30/tasks.get_all"
+        endpoint = "tasks.get_all"
         data = {"id": [task_id]}
         
         logger.info(f"Getting info for task {task_id}")
-        response = requests.post(url, headers=self.headers, json=data)
-        response.raise_for_status()
+        response = self._request("POST", endpoint, json=data)
         
         tasks = response.json()["data"]["tasks"]
         if not tasks:
@@ -246,6 +546,468 @@ class ClearMLClient:
             logger.warning(f"Timeout reached while waiting for task to start. Last status: {last_status}")
         
         return last_status
+    
+    def get_tasks_status(self, task_ids: List[str]) -> Dict[str, str]:
+        """Get the status of many tasks with one tasks.get_all call per STATUS_BATCH_SIZE IDs."""
+        endpoint = "tasks.get_all"
+        statuses = {}
+        for i in range(0, len(task_ids), STATUS_BATCH_SIZE):
+            data = {"id": task_ids[i:i + STATUS_BATCH_SIZE], "only_fields": ["id", "status"]}
+            response = self._request("POST", endpoint, json=data)
+            for task in response.json()["data"]["tasks"]:
+                statuses[task["id"]] = task.get("status", "unknown")
+        return statuses
+    
+    def iter_tasks_started(self, task_ids: List[str], timeout: float = 60, initial_interval: float = 1,
+                           max_interval: float = 30, backoff: float = 1.5) -> Iterator[Tuple[str, str]]:
+        """Yield (task_id, status) as each task reaches a STARTED_STATUSES status.
+
+        All pending tasks are polled together in one batched status call per tick. The interval
+        starts at initial_interval and grows by backoff up to max_interval, so short waits are
+        noticed quickly while long waits put little load on the server. Tasks still pending at
+        timeout are yielded last with their last seen status.
+        """
+        pending = {task_id: None for task_id in task_ids}
+        deadline = time.monotonic() + timeout
+        interval = initial_interval
+        
+        logger.info(f"Waiting up to {timeout} seconds for {len(pending)} tasks to start")
+        while pending:
+            for started in _pop_started(pending, self.get_tasks_status(list(pending))):
+                yield started
+            
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            logger.info(f"{len(pending)} tasks not started yet. Checking again in {min(interval, remaining):.1f} seconds...")
+            time.sleep(min(interval, remaining))
+            interval = min(interval * backoff, max_interval)
+        
+        if pending:
+            logger.warning(f"Timeout reached while waiting for {len(pending)} tasks to start")
+        for task_id, status in pending.items():
+            yield task_id, status
+    
+    def wait_for_tasks_to_start(self, task_ids: List[str], timeout: float = 60, **kwargs) -> Dict[str, str]:
+        """Wait for many tasks to start and return each task's final status (see iter_tasks_started)."""
+        return dict(self.iter_tasks_started(task_ids, timeout=timeout, **kwargs))
+    
+    async def aiter_tasks_started(self, task_ids: List[str], timeout: float = 60, initial_interval: float = 1,
+                                  max_interval: float = 30, backoff: float = 1.5) -> AsyncIterator[Tuple[str, str]]:
+        """Async iterator version of iter_tasks_started; the status calls run in a worker thread."""
+        pending = {task_id: None for task_id in task_ids}
+        deadline = time.monotonic() + timeout
+        interval = initial_interval
+        
+        while pending:
+            statuses = await asyncio.to_thread(self.get_tasks_status, list(pending))
+            for started in _pop_started(pending, statuses):
+                yield started
+            
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * backoff, max_interval)
+        
+        for task_id, status in pending.items():
+            yield task_id, status
+
+
+class AsyncClearMLClient:
+    """asyncio version of ClearMLClient built on aiohttp (pip install aiohttp).
+
+    Offers the same methods as coroutines. One event loop can drive thousands of concurrent calls,
+    and the connector keeps at most `limit` connections open. Use it as an async context manager,
+    or call close() when done.
+    """
+    
+    def __init__(self, webserver_url: str, basic_auth: str, limit: int = 100, max_retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 30, lookup_ttl: float = 300,
+                 metrics: Optional[ApiMetrics] = None):
+        self.webserver_url = webserver_url
+        self.api_url = f"{webserver_url}/api/v2.30"
+        self.basic_auth = basic_auth
+        self.token = None
+        self.headers = {}
+        self.limit = limit
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.lookup_ttl = lookup_ttl
+        self.metrics = metrics
+        self._lookups: Dict[str, tuple] = {}
+        # task ID -> execution queue, for tasks created by this client and not enqueued since
+        self._known_tasks: Dict[str, Optional[str]] = {}
+        self._session = None
+        self._login_lock = asyncio.Lock()
+    
+    async def __aenter__(self) -> "AsyncClearMLClient":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    def _get_session(self):
+        if self._session is None:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self.limit)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+    
+    async def close(self) -> None:
+        """Close the underlying session and its pooled connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    async def _send(self, method: str, url: str, **kwargs) -> Tuple[int, Any, Any]:
+        """Send a request, retrying transient 5xx responses and connection errors.
+
+        Creating and enqueueing calls are only retried after a failed connect or a 503, like
+        ClearMLClient._send. Returns (status, parsed JSON body or None, response) with the body
+        already read.
+        """
+        import aiohttp
+        session = self._get_session()
+        idempotent = url.rsplit("/", 1)[-1] not in NON_IDEMPOTENT_ENDPOINTS
+        retry_statuses = RETRY_STATUSES if idempotent else NON_IDEMPOTENT_RETRY_STATUSES
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    raw = await response.read()
+                    if self.metrics is not None:
+                        sent = len(json.dumps(kwargs["json"])) if "json" in kwargs else 0
+                        self.metrics.observe(url.rsplit("/", 1)[-1], time.perf_counter() - started,
+                                             response.status, sent, len(raw))
+                    body = json.loads(raw) if response.status < 400 and raw else None
+                    if response.status not in retry_statuses or attempt >= self.max_retries:
+                        return response.status, body, response
+                    logger.warning(f"{method} {url} returned {response.status}, retrying")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if self.metrics is not None:
+                    self.metrics.observe(url.rsplit("/", 1)[-1], time.perf_counter() - started, 0, 0, 0)
+                # A timeout may come after the request was sent; only a failed connect is safe to repeat
+                if attempt >= self.max_retries or not (idempotent or isinstance(e, aiohttp.ClientConnectorError)):
+                    raise
+                logger.warning(f"{method} {url} failed ({e!r}), retrying")
+            await asyncio.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+            attempt += 1
+    
+    async def login(self) -> str:
+        """Authenticate with ClearML server and get token."""
+        logger.info(f"Authenticating with ClearML server at {self.webserver_url}")
+        status, body, response = await self._send("POST", f"{self.api_url}/auth.login",
+                                                  headers=_login_headers(self.webserver_url, self.basic_auth))
+        response.raise_for_status()
+        self.token = body["data"]["token"]
+        self.headers = _token_headers(self.token)
+        logger.info("Authentication successful - token received")
+        return self.token
+    
+    async def _request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+        """Call an API endpoint with the session token, re-login once on 401, and return the JSON body."""
+        url = f"{self.api_url}/{endpoint}"
+        token = self.token
+        status, body, response = await self._send(method, url, headers=self.headers, **kwargs)
+        if status == 401:
+            async with self._login_lock:
+                if self.token == token:
+                    logger.info("Token rejected by the server, logging in again")
+                    await self.login()
+            status, body, response = await self._send(method, url, headers=self.headers, **kwargs)
+        response.raise_for_status()
+        return body
+    
+    async def _lookup(self, kind: str, fetch, refresh: bool = False) -> tuple:
+        cached = self._lookups.get(kind)
+        if cached and not refresh and time.monotonic() - cached[0] < self.lookup_ttl:
+            return cached[1], cached[2]
+        items = await fetch()
+        index = {item["name"]: item["id"] for item in items}
+        self._lookups[kind] = (time.monotonic(), items, index)
+        return items, index
+    
+    def invalidate_lookups(self, kind: Optional[str] = None) -> None:
+        """Drop the cached queue/project index (or both when kind is None)."""
+        if kind is None:
+            self._lookups.clear()
+        else:
+            self._lookups.pop(kind, None)
+    
+    async def create_project(self, project_name: str) -> str:
+        """Create a new project and return its ID."""
+        data = {
+            "name": project_name,
+            "description": "test in progress",
+            "system_tags": [],
+            "default_output_destination": None
+        }
+        logger.info(f"Creating project '{project_name}'")
+        project_id = (await self._request("POST", "projects.create", json=data))["data"]["id"]
+        logger.info(f"Created project '{project_name}' with ID: {project_id}")
+        self.invalidate_lookups("projects")
+        return project_id
+    
+    async def _fetch_all_projects(self) -> List[Dict[str, Any]]:
+        body = await self._request("POST", "projects.get_all", json={"only_fields": ["id", "name"]})
+        return body["data"]["projects"]
+    
+    async def get_all_projects(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """Get all projects (cached for lookup_ttl seconds unless refresh is set)."""
+        return (await self._lookup("projects", self._fetch_all_projects, refresh))[0]
+    
+    async def get_project_id(self, project_name: str) -> Optional[str]:
+        """Check if project exists and return its ID if found."""
+        return (await self._lookup("projects", self._fetch_all_projects))[1].get(project_name)
+    
+    async def _fetch_all_queues(self) -> List[Dict[str, Any]]:
+        return (await self._request("GET", "queues.get_all"))["data"]["queues"]
+    
+    async def get_all_queues(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """Get all available queues (cached for lookup_ttl seconds unless refresh is set)."""
+        return (await self._lookup("queues", self._fetch_all_queues, refresh))[0]
+    
+    async def get_queue_id(self, queue_name: str) -> Optional[str]:
+        """Check if queue exists and return its ID if found."""
+        return (await self._lookup("queues", self._fetch_all_queues))[1].get(queue_name)
+    
+    async def create_queue(self, queue_name: str) -> str:
+        """Create a new queue and return its ID."""
+        logger.info(f"Creating queue '{queue_name}'")
+        queue_id = (await self._request("POST", "queues.create", json={"name": queue_name}))["data"]["id"]
+        logger.info(f"Created queue '{queue_name}' with ID: {queue_id}")
+        self.invalidate_lookups("queues")
+        return queue_id
+    
+    async def create_task(self, task_config: Dict[str, Any], queue_id: Optional[str] = None) -> str:
+        """Create a new task, optionally with its execution queue already set, and return its ID."""
+        if queue_id:
+            task_config = {**task_config, "execution": {**task_config.get("execution", {}), "queue": queue_id}}
+        task_id = (await self._request("POST", "tasks.create", json=task_config))["data"]["id"]
+        self._known_tasks[task_id] = queue_id
+        logger.info(f"Created task '{task_config['name']}' with ID: {task_id}")
+        return task_id
+    
+    async def create_and_enqueue_task(self, task_config: Dict[str, Any], queue_id: str) -> str:
+        """Create a task with its queue set and enqueue it in two API calls, returning its ID."""
+        task_id = await self.create_task(task_config, queue_id=queue_id)
+        await self.enqueue_task(queue_id, task_id)
+        return task_id
+    
+    async def update_task(self, task_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Update task properties."""
+        body = await self._request("POST", "tasks.edit", json={"task": task_id, **data})
+        if "execution" in data and task_id in self._known_tasks:
+            self._known_tasks[task_id] = data["execution"].get("queue")
+        return body
+    
+    async def reset_task(self, task_id: str) -> Dict[str, Any]:
+        """Reset task status to 'created'."""
+        self._known_tasks.pop(task_id, None)
+        return await self._request("POST", "tasks.reset", json={"task": task_id})
+    
+    async def stop_task(self, task_id: str) -> Dict[str, Any]:
+        """Stop a running task."""
+        self._known_tasks.pop(task_id, None)
+        return await self._request("POST", "tasks.stop", json={"task": task_id})
+    
+    async def enqueue_task(self, queue_id: str, task_id: str) -> Dict[str, Any]:
+        """Enqueue a task and return the response (same checks and fast path as ClearMLClient.enqueue_task)."""
+        import aiohttp
+        fresh = task_id in self._known_tasks
+        created_queue = self._known_tasks.pop(task_id, None)
+        if not fresh:
+            task_info = await self.get_task_info(task_id)
+            current_status = task_info.get("status")
+            if current_status in ["queued", "in_progress"]:
+                logger.info(f"Task is already {current_status}, resetting it first")
+                try:
+                    await self.stop_task(task_id)
+                    await self.reset_task(task_id)
+                except aiohttp.ClientResponseError as e:
+                    logger.warning(f"Could not reset task: {e}")
+        
+        if created_queue != queue_id:
+            await self.update_task(task_id, {"execution": {"queue": queue_id}})
+        body = await self._request("POST", "tasks.enqueue", json={"queue": queue_id, "task": task_id})
+        logger.info(f"Task {task_id} enqueued to queue {queue_id}")
+        return body
+    
+    async def get_task_info(self, task_id: str) -> Dict[str, Any]:
+        """Get detailed information about a task."""
+        tasks = (await self._request("POST", "tasks.get_all", json={"id": [task_id]}))["data"]["tasks"]
+        if not tasks:
+            raise ValueError(f"Task {task_id} not found")
+        return tasks[0]
+    
+    async def get_task_status(self, task_id: str) -> str:
+        """Get the status of a task."""
+        return (await self.get_task_info(task_id)).get("status", "unknown")
+    
+    async def get_tasks_status(self, task_ids: List[str]) -> Dict[str, str]:
+        """Get the status of many tasks with one tasks.get_all call per STATUS_BATCH_SIZE IDs."""
+        batches = [task_ids[i:i + STATUS_BATCH_SIZE] for i in range(0, len(task_ids), STATUS_BATCH_SIZE)]
+        bodies = await asyncio.gather(*(
+            self._request("POST", "tasks.get_all", json={"id": batch, "only_fields": ["id", "status"]})
+            for batch in batches
+        ))
+        return {task["id"]: task.get("status", "unknown") for body in bodies for task in body["data"]["tasks"]}
+    
+    async def iter_tasks_started(self, task_ids: List[str], timeout: float = 60, initial_interval: float = 1,
+                                 max_interval: float = 30, backoff: float = 1.5) -> AsyncIterator[Tuple[str, str]]:
+        """Yield (task_id, status) as each task starts (see ClearMLClient.iter_tasks_started)."""
+        pending = {task_id: None for task_id in task_ids}
+        deadline = time.monotonic() + timeout
+        interval = initial_interval
+        
+        while pending:
+            for started in _pop_started(pending, await self.get_tasks_status(list(pending))):
+                yield started
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * backoff, max_interval)
+        
+        if pending:
+            logger.warning(f"Timeout reached while waiting for {len(pending)} tasks to start")
+        for task_id, status in pending.items():
+            yield task_id, status
+    
+    async def wait_for_tasks_to_start(self, task_ids: List[str], timeout: float = 60, **kwargs) -> Dict[str, str]:
+        """Wait for many tasks to start and return each task's final status."""
+        return {task_id: status async for task_id, status in self.iter_tasks_started(task_ids, timeout, **kwargs)}
+    
+    async def wait_for_task_to_start(self, task_id: str, timeout: float = 60, **kwargs) -> str:
+        """Wait for a task to start and return its final status."""
+        return (await self.wait_for_tasks_to_start([task_id], timeout, **kwargs))[task_id]
+
+
+def build_task_config(project_id: str, name: str, git_repo: str, git_branch: str, entrypoint: str,
+                      image: str, prerun_script: Optional[str] = None) -> Dict[str, Any]:
+    """Build the tasks.create payload for a training task, without an execution queue."""
+    return {
+        "project": project_id,
+        "name": name,
+        "type": "training",
+        "script": {
+            "repository": git_repo,
+            "branch": git_branch,
+            "working_dir": ".",
+            "entry_point": entrypoint,
+            "requirements": None
+        },
+        "hyperparams": {
+            "Args": {}
+        },
+        "container": {
+            "image": image,
+            "arguments": "-e CLEARML_AGENT_FORCE_TASK_INIT=1 -e CLEARML_AGENT_FORCE_POETRY",
+            "setup_shell_script": prerun_script
+        }
+    }
+
+
+# Manifest columns and the task settings they override
+MANIFEST_FIELDS = ("name", "repo", "branch", "entrypoint", "image", "prerun_script")
+
+
+def _optional_import(module: str, package: str, purpose: str):
+    """Import an optional dependency on first use, with an install hint if it is missing."""
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise Exception(f"{package} is required for {purpose} (pip install {package})")
+
+
+def load_task_manifest(path: str, defaults: Dict[str, Optional[str]]) -> List[Dict[str, Optional[str]]]:
+    """Load task rows from a CSV or YAML manifest, filling empty columns from defaults.
+
+    Each row may set any of MANIFEST_FIELDS. Rows without a name get the default name plus their
+    row number. Every row must end up with repo, branch, entrypoint and image.
+    """
+    with open(path, newline="") as f:
+        if path.endswith((".yaml", ".yml")):
+            yaml = _optional_import("yaml", "pyyaml", "YAML task manifests")
+            rows = yaml.safe_load(f) or []
+        else:
+            rows = list(csv.DictReader(f))
+    if not isinstance(rows, list):
+        raise ValueError(f"Manifest {path} must be a list of task rows, got {type(rows).__name__}")
+    
+    tasks = []
+    for i, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f"Manifest row {i} in {path} must be a mapping of fields, got {type(row).__name__} {row!r}")
+        task = {field: (row.get(field) or defaults.get(field)) for field in MANIFEST_FIELDS}
+        if not row.get("name"):
+            task["name"] = f"{defaults.get('name') or 'task'}-{i:04d}"
+        missing = [field for field in ("repo", "branch", "entrypoint", "image") if not task[field]]
+        if missing:
+            raise ValueError(f"Manifest row {i} ({task['name']}) is missing: {', '.join(missing)}")
+        tasks.append(task)
+    return tasks
+
+
+def submit_tasks_bulk(client: ClearMLClient, project_id: str, queue_id: str,
+                      tasks: List[Dict[str, Optional[str]]], workers: int = 8) -> List[Dict[str, Any]]:
+    """Create and enqueue many tasks concurrently and return one result per task, in manifest order.
+
+    Each task costs two API calls: tasks.create with the queue already set, then tasks.enqueue.
+    """
+    def submit(task: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        result = {"name": task["name"], "task_id": None, "status": "failed", "error": None}
+        try:
+            config = build_task_config(project_id, task["name"], task["repo"], task["branch"],
+                                       task["entrypoint"], task["image"], task["prerun_script"])
+            result["task_id"] = client.create_task(config, queue_id=queue_id)
+            client.enqueue_task(queue_id, result["task_id"])
+            result["status"] = "queued"
+        except Exception as e:
+            result["error"] = str(e)
+            logger.error(f"Failed to submit task '{task['name']}': {e}")
+        result["latency"] = time.perf_counter() - started
+        return result
+    
+    logger.info(f"Submitting {len(tasks)} tasks with {workers} workers")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tasks)))) as executor:
+        return list(executor.map(submit, tasks))
+
+
+def log_bulk_summary(results: List[Dict[str, Any]], wall_time: float) -> None:
+    """Log a per-task result table followed by success/failure totals and latency figures."""
+    logger.info("Bulk submission results:")
+    logger.info(f"  {'STATUS':<8} {'LATENCY':>8}  {'TASK ID':<34} NAME")
+    for result in results:
+        error = f"  ({result['error']})" if result["error"] else ""
+        logger.info(f"  {result['status']:<8} {result['latency']:7.2f}s  {result['task_id'] or '-':<34} "
+                    f"{result['name']}{error}")
+    
+    succeeded = sum(1 for result in results if result["status"] == "queued")
+    latencies = sorted(result["latency"] for result in results)
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        logger.info(f"  {succeeded} succeeded, {len(results) - succeeded} failed in {wall_time:.2f}s "
+                    f"({len(results) / wall_time:.1f} tasks/s, p50 {latencies[len(latencies) // 2]:.2f}s, "
+                    f"p95 {p95:.2f}s)")
+
+
+def report_api_metrics(metrics: Optional[ApiMetrics], metrics_file: Optional[str] = None) -> None:
+    """Log the per-endpoint API call summary and optionally write it in Prometheus text format."""
+    if metrics is None:
+        return
+    logger.info("API calls:")
+    for line in metrics.summary_lines():
+        logger.info(f"  {line}")
+    if metrics_file:
+        with open(metrics_file, "w") as f:
+            f.write(metrics.to_prometheus())
+        logger.info(f"API metrics written to {metrics_file}")
 
 
 def main():
@@ -253,6 +1015,10 @@ def main():
     webserver_url = os.environ.get("WEBSERVER_URL")
     webserver_basic_auth = os.environ.get("WEBSERVER_BASIC_AUTH")
     debug_mode = os.environ.get("DEBUG", "false").lower() == "true"
+    max_retries = int(os.environ.get("MAX_RETRIES", "3"))
+    api_metrics = os.environ.get("API_METRICS", "false").lower() == "true"
+    api_metrics_file = os.environ.get("API_METRICS_FILE")
+    request_timeout = float(os.environ.get("REQUEST_TIMEOUT", "30"))
     
     # Check for required environment variables
     if not webserver_url or not webserver_basic_auth:
@@ -272,33 +1038,53 @@ def main():
     task_image = os.environ.get("TASK_IMAGE")
     task_prerun_script = os.environ.get("TASK_PRERUN_SCRIPT")
     
+    # Optional: Submit many tasks from a CSV/YAML manifest instead of a single task
+    task_manifest = os.environ.get("TASK_MANIFEST")
+    bulk_workers = int(os.environ.get("BULK_WORKERS", "8"))
+    
     # Optional: Wait for task to start
     wait_for_task = os.environ.get("WAIT_FOR_TASK", "false").lower() == "true"
     wait_timeout = int(os.environ.get("WAIT_TIMEOUT", "60"))
     
-    # Check for required task settings
-    if not all([queue_name, task_git_repo, task_git_branch, task_entrypoint, task_image]):
-        missing = []
-        for var_name, var_value in {
-            "QUEUE_NAME": queue_name,
+    # Check for required task settings (in bulk mode the manifest can provide the task ones)
+    required = {"QUEUE_NAME": queue_name}
+    if not task_manifest:
+        required.update({
             "TASK_GIT_REPO": task_git_repo,
             "TASK_GIT_BRANCH": task_git_branch,
             "TASK_ENTRYPOINT": task_entrypoint,
             "TASK_IMAGE": task_image
-        }.items():
-            if not var_value:
-                missing.append(var_name)
+        })
+    missing = [var_name for var_name, var_value in required.items() if not var_value]
+    if missing:
         raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
     
+    manifest_tasks = None
+    if task_manifest:
+        manifest_tasks = load_task_manifest(task_manifest, {
+            "name": os.environ.get("TASK_NAME", "random-logger"),
+            "repo": task_git_repo,
+            "branch": task_git_branch,
+            "entrypoint": task_entrypoint,
+            "image": task_image,
+            "prerun_script": task_prerun_script
+        })
+    
     # Initialize ClearML client
-    client = ClearMLClient(webserver_url, webserver_basic_auth, debug=debug_mode)
+    client = ClearMLClient(webserver_url, webserver_basic_auth, debug=debug_mode,
+                           pool_size=max(10, bulk_workers), max_retries=max_retries, timeout=request_timeout,
+                           metrics=ApiMetrics() if api_metrics or api_metrics_file else None)
     
     # 1. Login and get token
     client.login()
     
-    # 2. Get or create project
+    # 2. Get or create project. Only an explicit PROJECT_NAME is looked up: the lookup fetches every
+    # project, and a generated test-vNNN name should get a new project rather than reuse an old one
     if not project_id:
-        project_id = client.create_project(project_name)
+        if os.environ.get("PROJECT_NAME"):
+            project_id = client.get_project_id(project_name)
+        if not project_id:
+            project_id = client.create_project(project_name)
     else:
         logger.info(f"Using existing project ID: {project_id}")
     
@@ -312,47 +1098,40 @@ def main():
     else:
         logger.info(f"Using existing queue ID: {queue_id}")
     
-    # Display all available queues for debugging
+    # Display all available queues for debugging (served from the lookup cache when fresh)
     if debug_mode:
         all_queues = client.get_all_queues()
         logger.info("Available queues:")
         for q in all_queues:
             logger.info(f"  - {q['name']} (ID: {q['id']})")
     
-    # 4. Create task without setting the execution queue yet
-    task_config = {
-        "project": project_id,
-        "name": task_name,
-        "type": "training",
-        "script": {
-            "repository": task_git_repo,
-            "branch": task_git_branch,
-            "working_dir": ".",
-            "entry_point": task_entrypoint,
-            "requirements": None
-        },
-        "hyperparams": {
-            "Args": {}
-        },
-        "container": {
-            "image": task_image,
-            "arguments": "-e CLEARML_AGENT_FORCE_TASK_INIT=1 -e CLEARML_AGENT_FORCE_POETRY",
-            "setup_shell_script": task_prerun_script
-        }
-    }
+    # Bulk mode: submit every manifest task concurrently and report per-task results
+    if manifest_tasks is not None:
+        try:
+            started = time.perf_counter()
+            results = submit_tasks_bulk(client, project_id, queue_id, manifest_tasks, workers=bulk_workers)
+            log_bulk_summary(results, time.perf_counter() - started)
+            
+            if wait_for_task:
+                queued = [result["task_id"] for result in results if result["status"] == "queued"]
+                counts = {}
+                for task_id, status in client.iter_tasks_started(queued, timeout=wait_timeout):
+                    counts[status] = counts.get(status, 0) + 1
+                logger.info("Task statuses after waiting: " +
+                            ", ".join(f"{status}: {count}" for status, count in sorted(counts.items())))
+            report_api_metrics(client.metrics, api_metrics_file)
+        finally:
+            client.close()
+        return
+    
+    # 4. Create task with its execution queue already set
+    task_config = build_task_config(project_id, task_name, task_git_repo, task_git_branch,
+                                    task_entrypoint, task_image, task_prerun_script)
     
-    task_id = client.create_task(task_config)
+    task_id = client.create_task(task_config, queue_id=queue_id)
     
-    # 5. Enqueue task (this will also update the task with the queue)
+    # 5. Enqueue task (the client knows it is fresh, so this is a single tasks.enqueue call)
     try:
-        # First explicitly set the execution queue in the task
-        client.update_task(task_id, {
-            "execution": {
-                "queue": queue_id
-            }
-        })
-        
-        # Then enqueue the task
         client.enqueue_task(queue_id, task_id)
     except requests.exceptions.HTTPError as e:
         logger.error(f"Error enqueueing task: {e}")
@@ -385,6 +1164,8 @@ def main():
     logger.info(f"  Queue: {queue_name} (ID: {queue_id})")
     logger.info(f"  Task: {task_name} (ID: {task_id})")
     logger.info(f"  Status: {final_status}")
+    report_api_metrics(client.metrics, api_metrics_file)
+    client.close()
 
 
 if __name__ == "__main__":
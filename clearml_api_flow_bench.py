@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# pip install requests (optional: aiohttp for the async client benchmark)
+#
+# Benchmark the task submission flow of clearml_api_flow.py against a local fake ClearML apiserver:
+#   python3 clearml_api_flow_bench.py --tasks 200 --workers 16 --latency-ms 20 --error-rate 0.01
+#
+# Or only run the fake apiserver and point clearml_api_flow.py at it:
+#   python3 clearml_api_flow_bench.py --serve --port 8008 --latency-ms 20
+#   WEBSERVER_URL=http://127.0.0.1:8008 WEBSERVER_BASIC_AUTH=x QUEUE_NAME=q TASK_GIT_REPO=r \
+#     TASK_GIT_BRANCH=main TASK_ENTRYPOINT=main.py TASK_IMAGE=python:3.11 python3 clearml_api_flow.py
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Tuple
+
+import clearml_api_flow
+from bench_common import FakeHandler, FakeHTTPServer, percentiles
+from clearml_api_flow import ClearMLClient, AsyncClearMLClient, build_task_config, submit_tasks_bulk
+
+
+class FakeClearML:
+    """In-memory stand-in for the ClearML apiserver endpoints used by ClearMLClient."""
+
+    def __init__(self, port: int = 0, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 token_ttl: float = 0, start_delay: float = 0):
+        """
+        Args:
+            port: Port to listen on (0 picks a free one)
+            latency_ms: Delay added to every response
+            jitter_ms: Random extra delay, uniform in [0, jitter_ms]
+            error_rate: Fraction of API calls (login excluded) answered with 503
+            token_ttl: Seconds after which a token is rejected with 401 (0 = never)
+            start_delay: Seconds after enqueueing at which a task reports in_progress
+        """
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.token_ttl = token_ttl
+        self.start_delay = start_delay
+        self.calls: Dict[str, int] = {}
+        self.errors = 0
+        self.tokens: Dict[str, float] = {}
+        self.projects: Dict[str, Dict[str, Any]] = {}
+        self.queues: Dict[str, Dict[str, Any]] = {}
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.httpd = FakeHTTPServer(('127.0.0.1', port), self._handler_class())
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def start(self) -> 'FakeClearML':
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.errors = 0
+
+    def _task_view(self, task: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+        if task['status'] == 'queued' and self.start_delay and time.monotonic() - task['queued_at'] >= self.start_delay:
+            task['status'] = 'in_progress'
+        view = {k: v for k, v in task.items() if k != 'queued_at'}
+        return {k: view[k] for k in fields if k in view} if fields else view
+
+    def handle(self, endpoint: str, request: Dict[str, Any], cookie: str) -> Tuple[int, Dict[str, Any]]:
+        """Apply one API call to the in-memory state and return (HTTP status, response body)."""
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            if endpoint == 'auth.login':
+                token = uuid.uuid4().hex
+                self.tokens[token] = time.monotonic()
+                return 200, {'data': {'token': token}}
+
+            token = cookie.split('clearml-token-k8s=', 1)[-1] if 'clearml-token-k8s=' in cookie else None
+            issued = self.tokens.get(token)
+            if issued is None or (self.token_ttl and time.monotonic() - issued > self.token_ttl):
+                self.errors += 1
+                return 401, {'meta': {'result_code': 401, 'result_msg': 'Invalid token'}}
+            if self.error_rate and random.random() < self.error_rate:
+                self.errors += 1
+                return 503, {'meta': {'result_code': 503, 'result_msg': 'Injected error'}}
+
+            if endpoint in ('projects.create', 'queues.create'):
+                store = self.projects if endpoint == 'projects.create' else self.queues
+                if any(item['name'] == request.get('name') for item in store.values()):
+                    return 400, {'meta': {'result_code': 400, 'result_msg': 'Name already exists'}}
+                item_id = uuid.uuid4().hex
+                store[item_id] = {'id': item_id, 'name': request.get('name')}
+                return 200, {'data': {'id': item_id}}
+            if endpoint == 'projects.get_all':
+                return 200, {'data': {'projects': list(self.projects.values())}}
+            if endpoint == 'queues.get_all':
+                return 200, {'data': {'queues': list(self.queues.values())}}
+            if endpoint == 'tasks.create':
+                task_id = uuid.uuid4().hex
+                self.tasks[task_id] = {'execution': {}, **request, 'id': task_id, 'status': 'created'}
+                return 200, {'data': {'id': task_id}}
+            if endpoint == 'tasks.get_all':
+                tasks = [self._task_view(self.tasks[i], request.get('only_fields'))
+                         for i in request.get('id', []) if i in self.tasks]
+                return 200, {'data': {'tasks': tasks}}
+
+            task = self.tasks.get(request.get('task'))
+            if task is None:
+                return 400, {'meta': {'result_code': 400, 'result_msg': 'Invalid task id'}}
+            if endpoint == 'tasks.edit':
+                for key, value in request.items():
+                    if key != 'task':
+                        task[key] = {**task.get(key, {}), **value} if isinstance(value, dict) else value
+                return 200, {'data': {'updated': 1}}
+            if endpoint == 'tasks.enqueue':
+                if task['status'] not in ('created', 'stopped'):
+                    return 400, {'meta': {'result_code': 400, 'result_msg': f"Invalid task status {task['status']}"}}
+                task['status'] = 'queued'
+                task['queued_at'] = time.monotonic()
+                task['execution'] = {**task.get('execution', {}), 'queue': request.get('queue')}
+                return 200, {'data': {'queued': 1}}
+            if endpoint == 'tasks.stop':
+                task['status'] = 'stopped'
+                return 200, {'data': {'updated': 1}}
+            if endpoint == 'tasks.reset':
+                task['status'] = 'created'
+                return 200, {'data': {'updated': 1}}
+            return 404, {'meta': {'result_code': 404, 'result_msg': f"Unknown endpoint {endpoint}"}}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(FakeHandler):
+            def _serve(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                request = json.loads(raw) if raw else {}
+                endpoint = self.path.rstrip('/').rsplit('/', 1)[-1]
+                if fake.latency or fake.jitter:
+                    time.sleep(fake.latency + random.uniform(0, fake.jitter))
+                status, body = fake.handle(endpoint, request, self.headers.get('Cookie', ''))
+                self.send_body(status, json.dumps(body).encode('utf-8'))
+
+            do_GET = _serve
+            do_POST = _serve
+
+        return Handler
+
+
+def task_rows(count: int, prefix: str) -> List[Dict[str, str]]:
+    return [{'name': f"{prefix}-{i:05d}", 'repo': 'https://github.com/example/repo.git', 'branch': 'main',
+             'entrypoint': 'main.py', 'image': 'python:3.11', 'prerun_script': None} for i in range(count)]
+
+
+def summarize(fake: FakeClearML, mode: str, tasks: int, elapsed: float, latencies: List[float],
+              failed: int) -> Dict[str, Any]:
+    calls = dict(sorted(fake.calls.items()))
+    total_calls = sum(calls.values())
+    return {
+        'mode': mode,
+        'tasks': tasks,
+        'failed': failed,
+        'seconds': round(elapsed, 6),
+        'tasks_per_sec': round(tasks / elapsed, 3),
+        'api_calls': total_calls,
+        'api_calls_per_task': round(total_calls / tasks, 3),
+        'calls_by_endpoint': calls,
+        'server_errors_injected': fake.errors,
+        'task_latency': percentiles(latencies)
+    }
+
+
+def bench_single(fake: FakeClearML, client: ClearMLClient, project_id: str, queue_id: str, tasks: int,
+                 mode: str = 'single') -> Dict[str, Any]:
+    """Submit tasks one after another, the way main() submits its single task.
+
+    The 'defensive' mode creates each task behind the client's back, so enqueue_task treats it as
+    an existing task and takes the status check and queue update path.
+    """
+    fake.reset_counters()
+    latencies = []
+    failed = 0
+    started = time.perf_counter()
+    for row in task_rows(tasks, mode):
+        task_started = time.perf_counter()
+        try:
+            config = build_task_config(project_id, row['name'], row['repo'], row['branch'], row['entrypoint'], row['image'])
+            if mode == 'defensive':
+                task_id = client._request('POST', 'tasks.create', json=config).json()['data']['id']
+                client.enqueue_task(queue_id, task_id)
+            else:
+                client.create_and_enqueue_task(config, queue_id)
+        except Exception:
+            failed += 1
+        latencies.append(time.perf_counter() - task_started)
+    return summarize(fake, mode, tasks, time.perf_counter() - started, latencies, failed)
+
+
+def bench_bulk(fake: FakeClearML, client: ClearMLClient, project_id: str, queue_id: str, tasks: int,
+               workers: int) -> Dict[str, Any]:
+    """Submit tasks with submit_tasks_bulk."""
+    fake.reset_counters()
+    started = time.perf_counter()
+    results = submit_tasks_bulk(client, project_id, queue_id, task_rows(tasks, 'bulk'), workers=workers)
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for result in results if result['status'] != 'queued')
+    result = summarize(fake, 'bulk', tasks, elapsed, [r['latency'] for r in results], failed)
+    result['workers'] = workers
+    return result
+
+
+def bench_async(fake: FakeClearML, project_id: str, queue_id: str, tasks: int, limit: int,
+                args: argparse.Namespace) -> Dict[str, Any]:
+    """Submit tasks concurrently from one event loop with AsyncClearMLClient."""
+    async def run() -> Dict[str, Any]:
+        async with AsyncClearMLClient(fake.url, 'x', limit=limit, max_retries=args.retries, backoff=0.05) as client:
+            await client.login()
+            fake.reset_counters()
+            semaphore = asyncio.Semaphore(limit)
+
+            async def submit(row: Dict[str, str]) -> Tuple[float, bool]:
+                async with semaphore:
+                    task_started = time.perf_counter()
+                    try:
+                        await client.create_and_enqueue_task(build_task_config(
+                            project_id, row['name'], row['repo'], row['branch'], row['entrypoint'], row['image']), queue_id)
+                        return time.perf_counter() - task_started, True
+                    except Exception:
+                        return time.perf_counter() - task_started, False
+
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(*(submit(row) for row in task_rows(tasks, 'async')))
+            elapsed = time.perf_counter() - started
+            failed = sum(1 for _, ok in outcomes if not ok)
+            result = summarize(fake, 'async', tasks, elapsed, [latency for latency, _ in outcomes], failed)
+            result['limit'] = limit
+            return result
+
+    return asyncio.run(run())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark clearml_api_flow.py against a local fake ClearML apiserver')
+    parser.add_argument('--tasks', type=int, default=100, help='Number of tasks to submit per mode')
+    parser.add_argument('--workers', type=int, default=16, help='Workers for bulk mode and connection limit for async mode')
+    parser.add_argument('--latency-ms', type=float, default=10, help='Latency added to every API response')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Random extra latency per API response')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of API calls answered with 503')
+    parser.add_argument('--token-ttl', type=float, default=0, help='Seconds after which tokens expire (0 = never)')
+    parser.add_argument('--start-delay', type=float, default=0, help='Seconds after enqueue at which tasks report in_progress')
+    parser.add_argument('--retries', type=int, default=3, help='Client retries on transient errors')
+    parser.add_argument('--modes', type=str, default='defensive,single,bulk,async',
+                        help='Comma-separated modes to run (defensive, single, bulk, async)')
+    parser.add_argument('--serve', action='store_true', help='Only run the fake apiserver until interrupted')
+    parser.add_argument('--port', type=int, default=0, help='Port for the fake apiserver')
+    parser.add_argument('--output', type=str, help='Also write the JSON results to this file')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    fake = FakeClearML(port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                       error_rate=args.error_rate, token_ttl=args.token_ttl, start_delay=args.start_delay)
+    if args.serve:
+        print(f"Fake ClearML apiserver listening on {fake.url}")
+        try:
+            fake.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    # Per-call logging would dominate the measurements
+    clearml_api_flow.logger.setLevel(logging.WARNING)
+    fake.start()
+    try:
+        client = ClearMLClient(fake.url, 'x', pool_size=max(10, args.workers), max_retries=args.retries, backoff=0.05)
+        client.login()
+        project_id = client.create_project('bench-project')
+        queue_id = client.create_queue('bench-queue')
+
+        modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+        results = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': sys.version.split()[0],
+            'config': vars(args),
+            'modes': []
+        }
+        if 'defensive' in modes:
+            results['modes'].append(bench_single(fake, client, project_id, queue_id, args.tasks, mode='defensive'))
+        if 'single' in modes:
+            results['modes'].append(bench_single(fake, client, project_id, queue_id, args.tasks))
+        if 'bulk' in modes:
+            results['modes'].append(bench_bulk(fake, client, project_id, queue_id, args.tasks, args.workers))
+        if 'async' in modes:
+            if importlib.util.find_spec('aiohttp') is None:
+                print("Skipping async mode: aiohttp is not installed", file=sys.stderr)
+            else:
+                results['modes'].append(bench_async(fake, project_id, queue_id, args.tasks, args.workers, args))
+        client.close()
+    finally:
+        fake.stop()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+
+
+if __name__ == '__main__':
+    main()
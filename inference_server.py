@@ -1,48 +1,1370 @@
 # curl -X POST "http://localhost:8080/" \
 #      --data "word1=hello" \
 #      --data "word2=hey"
+#
+# python inference_server.py                                # thread pool, 16 workers
+# python inference_server.py --mode threaded --workers 64
+# python inference_server.py --mode asyncio
+# python inference_server.py --mode single                  # original one-request-at-a-time server
+# python inference_server.py --processes 4                  # 4 pre-forked workers sharing port 8080
+# python inference_server.py --processes 4 --reuse-port     # each worker binds its own SO_REUSEPORT socket
+# python inference_server.py --batch-size 32 --batch-wait-ms 5   # micro-batch predictions
+# curl http://localhost:8080/stats                          # batch size and queue wait statistics
+# python inference_server.py --cache-size 100000 --cache-ttl 300   # memoize repeated inputs
+# curl http://localhost:8080/metrics                        # Prometheus text format
+# python inference_server.py --log-sample-rate 0.01         # log 1% of requests (4xx/5xx are always logged)
+#
+# Request log lines are written by a background thread; when it falls behind, lines are dropped
+# and counted in inference_log_lines_dropped_total instead of slowing requests down. Each pre-fork
+# worker keeps its own metrics, so a scrape of the shared port sees one worker at a time.
+# python inference_server.py --keepalive-timeout 5 --max-keepalive-requests 1000
+#
+# Bulk predictions on /predict/batch: results stream back while the request body is still arriving.
+# curl -X POST "http://localhost:8080/predict/batch" -H "Content-Type: application/json" \
+#      --data '[{"word1": "hello", "word2": "hey"}, ["foo", "barbaz"]]'
+# curl -X POST "http://localhost:8080/predict/batch" -H "Content-Type: application/x-ndjson" \
+#      -H "Transfer-Encoding: chunked" --data-binary @inputs.ndjson
+# application/octet-stream bodies are a sequence of records, each a 4-byte big-endian length plus
+# UTF-8 word1 followed by the same for word2; each result comes back as a length-prefixed string.
+#
+# Connections are persistent HTTP/1.1 (pipelined requests are answered in order) until the client
+# sends "Connection: close", stays idle for --keepalive-timeout seconds or has sent
+# --max-keepalive-requests requests. In threaded mode an open connection holds a worker, so size
+# --workers for the expected number of concurrent connections, or use --mode asyncio.
+#
+# SIGTERM stops accepting, closes idle keep-alive connections, gives in-flight requests up to
+# --drain-timeout seconds to finish (their responses carry "Connection: close") and exits; in
+# pre-fork mode the supervisor forwards it to every worker and kills the ones still busy after that.
+# Load test with inference_server_bench.py.
 
+import argparse
+import asyncio
+import bisect
+import codecs
+import json
+import os
+import queue
+import random
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from http.server import BaseHTTPRequestHandler, HTTPServer
 import urllib.parse as urlparse
 
+READY_MESSAGE = "Server is running, ready to predict..."
+
+# CPU time burned per predict call and per predicted item to emulate a real model when benchmarking
+# (--busy-ms / --busy-item-ms); a batched call pays the per-call cost once for the whole batch
+BUSY_SECONDS = 0.0
+BUSY_ITEM_SECONDS = 0.0
+
+# MicroBatcher shared by the request handlers of this process, set up by serve() when --batch-size > 1
+BATCHER = None
+
+# PredictionCache in front of hello_batch() for this process, set up by serve() when --cache-size > 0
+CACHE = None
+
+# ServerMetrics and RequestLog of this process, set up by serve()
+METRICS = None
+REQUEST_LOG = None
+
+# Keep-alive limits (--keepalive-timeout / --max-keepalive-requests)
+KEEPALIVE_TIMEOUT = 5.0
+MAX_KEEPALIVE_REQUESTS = 1000
+
+# Items per predict call on /predict/batch (--stream-chunk-size)
+STREAM_CHUNK_SIZE = 256
+
 def hello(word1, word2):
     chars1 = len(str(word1))
     chars2 = len(str(word2))
     return f"1st word '{word1}' has {chars1} characters, 2nd word '{word2}' has {chars2} characters."
 
+def hello_batch(pairs):
+    """Vectorized hello(): predict a whole batch of (word1, word2) pairs in one call."""
+    if BUSY_SECONDS or BUSY_ITEM_SECONDS:
+        burn_cpu(BUSY_SECONDS + BUSY_ITEM_SECONDS * len(pairs))
+    return [hello(word1, word2) for word1, word2 in pairs]
+
+def predict_batch(pairs):
+    """Predict a batch through the response cache when it is enabled."""
+    if CACHE is not None:
+        return CACHE.predict_batch(pairs)
+    return hello_batch(pairs)
+
+def parse_form(post_data):
+    """Return the (word1, word2) fields of a form-encoded request body."""
+    query_params = urlparse.parse_qs(post_data.decode('utf-8'))
+
+    word1 = query_params.get('word1', [''])[0]
+    word2 = query_params.get('word2', [''])[0]
+
+    return word1, word2
+
+def predict_pair(pair):
+    """Predict one (word1, word2) input, cached and batched if enabled.
+
+    Returns the prediction with the seconds it spent in the batch queue and computing.
+    """
+    # Cache hits skip the batch queue entirely
+    if CACHE is not None:
+        cached = CACHE.get(pair)
+        if cached is not None:
+            return cached, 0.0, 0.0
+    if BATCHER is not None:
+        future = BATCHER.submit(pair)
+        return future.result(), future.queue_seconds, future.compute_seconds
+    started = time.perf_counter()
+    prediction = predict_batch([pair])[0]
+    return prediction, 0.0, time.perf_counter() - started
+
+def predict_form(post_data):
+    """Run hello() on the word1/word2 fields of a form-encoded request body, cached and batched if enabled."""
+    return predict_pair(parse_form(post_data))[0]
+
+def burn_cpu(seconds):
+    """Spin for `seconds` of CPU time while holding the GIL, like pure-Python model code."""
+    deadline = time.thread_time() + seconds
+    while time.thread_time() < deadline:
+        pass
+
+class MicroBatcher:
+    """Collects single predictions from many threads and runs them through a batch predict function.
+
+    A dispatcher thread takes the oldest queued item and keeps adding items until the batch has
+    max_batch_size items or the oldest item has waited max_wait seconds, then calls
+    predict_batch(items) and resolves each item's Future with its result. Items that queue up while
+    a batch is computing are flushed together as soon as it finishes. Each Future also gets
+    queue_seconds and compute_seconds attributes for its item.
+    """
+    # Queue wait histogram bucket upper bounds, in seconds
+    WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+    def __init__(self, predict_batch, max_batch_size=32, max_wait=0.005):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = {}  # batch size -> number of batches
+        self.wait_buckets = [0] * (len(self.WAIT_BUCKETS) + 1)
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.compute_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name='batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue one item and return a Future for its prediction."""
+        future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        return future
+
+    def close(self):
+        """Finish the queued items and stop the dispatcher thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+            deadline = entry[2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        started = time.monotonic()
+        try:
+            results = self.predict_batch([item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            results = None
+        compute = time.monotonic() - started
+
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            self.compute_seconds += compute
+            for _, future, queued in batch:
+                wait = started - queued
+                future.queue_seconds = wait
+                future.compute_seconds = compute
+                self.wait_buckets[bisect.bisect_left(self.WAIT_BUCKETS, wait)] += 1
+                self.wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+        if results is not None:
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        """Return batch size distribution and queue wait statistics."""
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch_size': round(self.items / self.batches, 3) if self.batches else 0,
+                'batch_sizes': dict(sorted(self.batch_sizes.items())),
+                'queue_wait_ms': {
+                    'mean': round(self.wait_seconds / self.items * 1000, 3) if self.items else 0,
+                    'max': round(self.max_wait_seconds * 1000, 3),
+                    'buckets': {f"le_{bound * 1000:g}": count
+                                for bound, count in zip(self.WAIT_BUCKETS + (float('inf'),), self.wait_buckets)}
+                },
+                'compute_ms_per_batch': round(self.compute_seconds / self.batches * 1000, 3) if self.batches else 0
+            }
+
+class BatchStream:
+    """Incremental codec for /predict/batch bodies.
+
+    feed() decodes whatever complete input records the new bytes finish, predicts them in chunks
+    of chunk_size through predict_batch() and returns the encoded results, so a response can be
+    streamed while the request is still being read. Malformed input raises ValueError.
+    """
+    CONTENT_TYPES = {
+        'application/json': 'json',
+        'application/x-ndjson': 'ndjson',
+        'application/jsonl': 'ndjson',
+        'application/octet-stream': 'binary',
+    }
+    RESPONSE_CONTENT_TYPES = {'json': 'application/json', 'ndjson': 'application/x-ndjson',
+                              'binary': 'application/octet-stream'}
+
+    def __init__(self, content_type, chunk_size=256):
+        self.format = self.CONTENT_TYPES.get(content_type.split(';', 1)[0].strip().lower())
+        if self.format is None:
+            raise ValueError(f"Unsupported Content-Type '{content_type}', expected one of: "
+                             f"{', '.join(self.CONTENT_TYPES)}")
+        self.content_type = self.RESPONSE_CONTENT_TYPES[self.format]
+        self.chunk_size = chunk_size
+        self.items = 0
+        self.bytes_in = 0
+        self.compute_seconds = 0.0
+        self._pending = []
+        self._text = ''
+        self._bytes = bytearray()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._json_state = 'start'  # start -> first -> sep <-> value -> done
+
+    def feed(self, data):
+        self.bytes_in += len(data)
+        self._decode(data, final=False)
+        output = []
+        while len(self._pending) >= self.chunk_size:
+            output.append(self._predict(self._pending[:self.chunk_size]))
+            del self._pending[:self.chunk_size]
+        return b''.join(output)
+
+    def finish(self):
+        """Predict the remaining items and return them with the closing bytes of the response."""
+        self._decode(b'', final=True)
+        output = self._predict(self._pending) if self._pending else b''
+        self._pending = []
+        if self.format == 'json':
+            output += b']' if self.items else b'[]'
+        return output
+
+    def error_record(self, message):
+        """Encoded error item that ends a response whose status was already sent (None for binary)."""
+        error = json.dumps({'error': message}).encode('utf-8')
+        if self.format == 'json':
+            return (b',' if self.items else b'[') + error + b']'
+        if self.format == 'ndjson':
+            return error + b'\n'
+        return None
+
+    def _predict(self, pairs):
+        started = time.perf_counter()
+        predictions = predict_batch(pairs)
+        self.compute_seconds += time.perf_counter() - started
+        results = [json.dumps(result).encode('utf-8') if self.format != 'binary' else result.encode('utf-8')
+                   for result in predictions]
+        first = self.items == 0
+        self.items += len(pairs)
+        if self.format == 'json':
+            return (b'[' if first else b',') + b','.join(results)
+        if self.format == 'ndjson':
+            return b''.join(result + b'\n' for result in results)
+        return b''.join(struct.pack('>I', len(result)) + result for result in results)
+
+    @staticmethod
+    def _to_pair(item):
+        if isinstance(item, dict):
+            return item.get('word1', ''), item.get('word2', '')
+        if isinstance(item, list) and len(item) == 2:
+            return item[0], item[1]
+        raise ValueError(f"Batch items must be {{\"word1\": ..., \"word2\": ...}} objects or [word1, word2] pairs, "
+                         f"got {json.dumps(item)[:100]}")
+
+    def _decode(self, data, final):
+        if self.format == 'binary':
+            self._decode_binary(data, final)
+            return
+        self._text += self._utf8.decode(data, final)
+        if self.format == 'ndjson':
+            lines = self._text.split('\n')
+            self._text = '' if final else lines.pop()
+            self._pending.extend(self._to_pair(json.loads(line)) for line in lines if line.strip())
+        else:
+            self._decode_json_array(final)
+
+    def _decode_binary(self, data, final):
+        buf = self._bytes
+        buf += data
+        pos = 0
+        while True:
+            if len(buf) - pos < 4:
+                break
+            len1 = struct.unpack_from('>I', buf, pos)[0]
+            if len(buf) - pos < 8 + len1:
+                break
+            len2 = struct.unpack_from('>I', buf, pos + 4 + len1)[0]
+            end = pos + 8 + len1 + len2
+            if len(buf) < end:
+                break
+            self._pending.append((bytes(buf[pos + 4:pos + 4 + len1]).decode('utf-8'),
+                                  bytes(buf[pos + 8 + len1:end]).decode('utf-8')))
+            pos = end
+        del buf[:pos]
+        if final and buf:
+            raise ValueError(f"Request body ends in the middle of a binary record ({len(buf)} bytes left)")
+
+    def _decode_json_array(self, final):
+        text = self._text
+        decoder = json.JSONDecoder()
+        pos = 0
+        while True:
+            while pos < len(text) and text[pos] in ' \t\r\n':
+                pos += 1
+            if pos == len(text):
+                break
+            state = self._json_state
+            if state == 'done':
+                raise ValueError('Unexpected data after the JSON array')
+            if state == 'start':
+                if text[pos] != '[':
+                    raise ValueError('Request body must be a JSON array')
+                self._json_state = 'first'
+                pos += 1
+            elif state == 'sep' or (state == 'first' and text[pos] == ']'):
+                if text[pos] == ']':
+                    self._json_state = 'done'
+                elif text[pos] != ',' or state == 'first':
+                    raise ValueError(f"Expected ',' or ']' in JSON array at offset {pos}")
+                else:
+                    self._json_state = 'value'
+                pos += 1
+            else:
+                try:
+                    item, pos = decoder.raw_decode(text, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise ValueError('Malformed JSON array item')
+                    break
+                self._pending.append(self._to_pair(item))
+                self._json_state = 'sep'
+        self._text = text[pos:]
+        if final and self._json_state != 'done':
+            raise ValueError('Request body ends before the JSON array is closed')
+
+def iter_request_body(rfile, content_length, chunked, block_size=65536):
+    """Yield a request body in blocks as it arrives, from Content-Length or chunked transfer encoding."""
+    if chunked:
+        while True:
+            size = int(rfile.readline().split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                while rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            block = rfile.read(size)
+            rfile.readline()
+            if len(block) < size:
+                raise ConnectionError('Connection closed in the middle of a request body chunk')
+            yield block
+    remaining = content_length
+    while remaining > 0:
+        block = rfile.read(min(block_size, remaining))
+        if not block:
+            raise ConnectionError('Connection closed before the request body ended')
+        remaining -= len(block)
+        yield block
+
+async def aiter_request_body(reader, content_length, chunked, block_size=65536):
+    """Async version of iter_request_body() for asyncio streams."""
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            block = await reader.readexactly(size)
+            await reader.readline()
+            yield block
+        return
+    remaining = content_length
+    while remaining > 0:
+        block = await reader.read(min(block_size, remaining))
+        if not block:
+            raise ConnectionError('Connection closed before the request body ended')
+        remaining -= len(block)
+        yield block
+
+class PredictionCache:
+    """Bounded LRU cache with a TTL in front of a batch predict function.
+
+    Inputs are normalized to (str(word1), str(word2)), the values hello() formats, so equal inputs
+    share an entry whatever type they arrived as. predict_batch() only passes the distinct misses of
+    a batch to the wrapped function. Every looked-up item counts once as a hit or a miss.
+    """
+
+    def __init__(self, predict_batch, max_size=10000, ttl=300):
+        self.predict_batch_fn = predict_batch
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expiry time, prediction), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(pair):
+        return str(pair[0]), str(pair[1])
+
+    def _lookup(self, key, now):
+        """Return the cached prediction or None; the caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get(self, pair):
+        """Return the cached prediction for one input, counting only hits (a miss is counted when it is predicted)."""
+        with self._lock:
+            value = self._lookup(self.key(pair), time.monotonic())
+            if value is not None:
+                self.hits += 1
+            return value
+
+    def predict_batch(self, pairs):
+        keys = [self.key(pair) for pair in pairs]
+        results = [None] * len(keys)
+        missing = {}  # key -> positions in the batch
+        with self._lock:
+            now = time.monotonic()
+            for i, key in enumerate(keys):
+                value = self._lookup(key, now)
+                if value is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    results[i] = value
+            self.hits += len(keys) - sum(len(positions) for positions in missing.values())
+            self.misses += sum(len(positions) for positions in missing.values())
+        if not missing:
+            return results
+
+        predictions = self.predict_batch_fn(list(missing))
+        with self._lock:
+            expires = time.monotonic() + self.ttl
+            for (key, positions), prediction in zip(missing.items(), predictions):
+                for i in positions:
+                    results[i] = prediction
+                self._entries[key] = (expires, prediction)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return size, limits and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text format; the caller holds the lock."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name, labels=''):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else f"{bound:g}"
+            lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{le}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ''
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {cumulative}")
+        return lines
+
+class ServerMetrics:
+    """Request counters, in-flight gauge, latency histograms and byte counters for /metrics.
+
+    Prediction requests also record how long they spent in the batch queue, computing and writing
+    the response. Paths outside METRIC_PATHS are counted as "other" to keep label values bounded.
+    """
+    METRIC_PATHS = ('/', '/predict/batch', '/stats', '/cache', '/metrics')
+    LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = {}  # (method, path, status) -> count
+        self.bytes_in = {}  # path -> request body bytes
+        self.bytes_out = {}  # path -> response body bytes
+        self.durations = {}  # path -> Histogram
+        self.phases = {phase: Histogram(self.LATENCY_BUCKETS) for phase in ('queue', 'compute', 'write')}
+
+    def metric_path(self, path):
+        path = path.split('?', 1)[0]
+        return path if path in self.METRIC_PATHS else 'other'
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method, path, status, seconds, bytes_in=0, bytes_out=0, phases=None):
+        path = self.metric_path(path)
+        with self._lock:
+            self.in_flight -= 1
+            key = (method, path, status or 0)  # 0: no response was sent
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.bytes_in[path] = self.bytes_in.get(path, 0) + bytes_in
+            self.bytes_out[path] = self.bytes_out.get(path, 0) + bytes_out
+            if path not in self.durations:
+                self.durations[path] = Histogram(self.LATENCY_BUCKETS)
+            self.durations[path].observe(seconds)
+            for phase, value in (phases or {}).items():
+                self.phases[phase].observe(value)
+
+    def render(self):
+        """Return this process's metrics, plus batcher, cache and log counters, in Prometheus text format."""
+        lines = []
+
+        def header(name, kind, text):
+            lines.extend([f"# HELP {name} {text}", f"# TYPE {name} {kind}"])
+
+        with self._lock:
+            header('inference_requests_total', 'counter', 'HTTP requests handled.')
+            lines += [f'inference_requests_total{{method="{m}",path="{p}",status="{s}"}} {count}'
+                      for (m, p, s), count in sorted(self.requests.items())]
+            header('inference_requests_in_flight', 'gauge', 'Requests being handled right now.')
+            lines.append(f"inference_requests_in_flight {self.in_flight}")
+            header('inference_request_bytes_total', 'counter', 'Request body bytes received.')
+            lines += [f'inference_request_bytes_total{{path="{p}"}} {n}' for p, n in sorted(self.bytes_in.items())]
+            header('inference_response_bytes_total', 'counter', 'Response body bytes sent.')
+            lines += [f'inference_response_bytes_total{{path="{p}"}} {n}' for p, n in sorted(self.bytes_out.items())]
+            header('inference_request_duration_seconds', 'histogram', 'Time from request line to response sent.')
+            for path, histogram in sorted(self.durations.items()):
+                lines += histogram.render('inference_request_duration_seconds', f'path="{path}"')
+            header('inference_request_phase_seconds', 'histogram',
+                   'Prediction request time spent in the batch queue, computing and writing the response.')
+            for phase, histogram in self.phases.items():
+                lines += histogram.render('inference_request_phase_seconds', f'phase="{phase}"')
+
+        if BATCHER is not None:
+            with BATCHER._lock:
+                sizes = Histogram(self.BATCH_SIZE_BUCKETS)
+                for size, count in BATCHER.batch_sizes.items():
+                    sizes.counts[bisect.bisect_left(sizes.buckets, size)] += count
+                    sizes.sum += size * count
+                waits = Histogram(MicroBatcher.WAIT_BUCKETS)
+                waits.counts = list(BATCHER.wait_buckets)
+                waits.sum = BATCHER.wait_seconds
+            header('inference_batch_size', 'histogram', 'Items per micro-batch.')
+            lines += sizes.render('inference_batch_size')
+            header('inference_batch_queue_wait_seconds', 'histogram', 'Time items waited for their micro-batch.')
+            lines += waits.render('inference_batch_queue_wait_seconds')
+
+        if CACHE is not None:
+            stats = CACHE.stats()
+            for name, kind, text in (('hits', 'counter', 'Predictions served from the cache.'),
+                                     ('misses', 'counter', 'Predictions computed after a cache miss.'),
+                                     ('evictions', 'counter', 'Cache entries evicted to stay within the size limit.'),
+                                     ('expirations', 'counter', 'Cache entries dropped after their TTL.'),
+                                     ('size', 'gauge', 'Entries in the prediction cache.')):
+                metric = f"inference_cache_{name}" + ('_total' if kind == 'counter' else '')
+                header(metric, kind, text)
+                lines.append(f"{metric} {stats[name]}")
+
+        if REQUEST_LOG is not None:
+            header('inference_log_lines_dropped_total', 'counter', 'Request log lines dropped because the log queue was full.')
+            lines.append(f"inference_log_lines_dropped_total {REQUEST_LOG.dropped}")
+        return '\n'.join(lines) + '\n'
+
+class RequestLog:
+    """Writes sampled request log lines to stderr from a background thread.
+
+    Request handlers only roll the sampling dice and append the line to a deque; the writer thread
+    wakes every flush_interval seconds and writes everything queued in one go, so it does not
+    compete with the handlers for the GIL on every line. Lines beyond max_queued are dropped and
+    counted instead of blocking the request.
+    """
+
+    def __init__(self, sample_rate=1.0, max_queued=10000, flush_interval=0.1, stream=None):
+        self.sample_rate = sample_rate
+        self.max_queued = max_queued
+        self.flush_interval = flush_interval
+        self.stream = stream or sys.stderr
+        self.dropped = 0
+        self._lines = deque()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-log', daemon=True)
+        self._thread.start()
+
+    def sampled(self):
+        """Decide whether the current request gets logged; format the line only if it does."""
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def write(self, line):
+        if len(self._lines) >= self.max_queued:
+            self.dropped += 1
+            return
+        self._lines.append(line)
+
+    def close(self):
+        """Write out the queued lines and stop the writer thread."""
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def _flush(self):
+        lines = []
+        while self._lines:
+            lines.append(self._lines.popleft())
+        if lines:
+            self.stream.write(''.join(lines))
+            self.stream.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._flush()
+        self._flush()
+
+def get_response(path):
+    """Return (status, content type, body text) for a GET request."""
+    if path.split('?', 1)[0] == '/metrics' and METRICS is not None:
+        return 200, 'text/plain; version=0.0.4', METRICS.render()
+    if path.split('?', 1)[0] == '/stats':
+        stats = {'pid': os.getpid(), 'batching': BATCHER.stats() if BATCHER is not None else None,
+                 'cache': CACHE.stats() if CACHE is not None else None}
+        return 200, 'application/json', json.dumps(stats)
+    if path.split('?', 1)[0] == '/cache':
+        return 200, 'application/json', json.dumps(CACHE.stats() if CACHE is not None else None)
+    return 200, 'text/plain', READY_MESSAGE
+
 class MyHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        response = "Server is running, ready to predict..."
+    protocol_version = 'HTTP/1.1'
+    # Responses go out as one header write and one body write; without this, Nagle's algorithm
+    # holds the body back until the client's delayed ACK for the headers arrives
+    disable_nagle_algorithm = True
+    # Idle keep-alive connections are closed after this many seconds (set from --keepalive-timeout)
+    timeout = KEEPALIVE_TIMEOUT
+
+    def setup(self):
+        super().setup()
+        self.requests_handled = 0
+
+    def parse_request(self):
+        # Called once the request line has arrived, so idle keep-alive time is not counted
+        self.server.connection_busy(self.connection)
+        self.request_started = time.perf_counter()
+        self.status_code = None
+        self.bytes_in = self.bytes_out = 0
+        self.phases = None
+        if METRICS is not None:
+            METRICS.request_started()
+        return super().parse_request()
 
-        self.send_response(200)
-        self.send_header('Content-type', 'text/plain')
+    def handle_one_request(self):
+        self.request_started = None
+        if not self.server.connection_idle(self.connection):
+            self.close_connection = True
+            return
+        try:
+            super().handle_one_request()
+        finally:
+            self.server.connection_busy(self.connection)
+            if self.request_started is not None and METRICS is not None:
+                METRICS.request_finished(self.command or '-', self.path if self.command else '', self.status_code,
+                                         time.perf_counter() - self.request_started, self.bytes_in,
+                                         self.bytes_out, self.phases)
+
+    def send_response(self, code, message=None):
+        self.status_code = code
+        super().send_response(code, message)
+
+    def log_message(self, format, *args):
+        if REQUEST_LOG is None:
+            super().log_message(format, *args)
+        elif REQUEST_LOG.sampled():
+            REQUEST_LOG.write(f"{self.address_string()} - - [{self.log_date_time_string()}] {format % args}\n")
+
+    def log_error(self, format, *args):
+        if REQUEST_LOG is None:
+            super().log_error(format, *args)
+        else:
+            REQUEST_LOG.write(f"{self.address_string()} - - [{self.log_date_time_string()}] {format % args}\n")
+
+    def log_request(self, code='-', size='-'):
+        # Error responses bypass --log-sample-rate
+        if isinstance(code, int) and code >= 400:
+            self.log_error('"%s" %s %s', self.requestline, str(int(code)), str(size))
+        else:
+            super().log_request(code, size)
+
+    def send_text(self, status, content_type, response, close=False):
+        """Send a complete response, closing the connection after the last allowed request or on stop."""
+        body = response.encode('utf-8')
+        self.requests_handled += 1
+        self.bytes_out += len(body)
+
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if close or self.requests_handled >= MAX_KEEPALIVE_REQUESTS or self.server.stopping.is_set():
+            self.send_header('Connection', 'close')
         self.end_headers()
-        self.wfile.write(response.encode('utf-8'))
+        self.wfile.write(body)
+
+    def predict_batch(self):
+        """Stream /predict/batch results back with chunked encoding (HTTP/1.0: until close)."""
+        try:
+            stream = BatchStream(self.headers.get('Content-Type', ''), chunk_size=STREAM_CHUNK_SIZE)
+        except ValueError as e:
+            self.send_text(415, 'text/plain', str(e), close=True)
+            return
+        # Chunked framing needs an HTTP/1.1 response line as well as an HTTP/1.1 client; OneShotHandler
+        # answers with HTTP/1.0, so its body is delimited by closing the connection instead
+        chunked = self.protocol_version == 'HTTP/1.1' and self.request_version == 'HTTP/1.1'
+        started = False
+
+        def write(data, final=False):
+            nonlocal started
+            if not data and not final:
+                return
+            if not started:
+                started = True
+                self.requests_handled += 1
+                self.send_response(200)
+                self.send_header('Content-type', stream.content_type)
+                if chunked:
+                    self.send_header('Transfer-Encoding', 'chunked')
+                if (not chunked or self.requests_handled >= MAX_KEEPALIVE_REQUESTS
+                        or self.server.stopping.is_set()):
+                    self.send_header('Connection', 'close')
+                self.end_headers()
+            write_started = time.perf_counter()
+            if chunked:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data) if data else b'')
+                if final:
+                    self.wfile.write(b'0\r\n\r\n')
+            else:
+                self.wfile.write(data)
+            self.bytes_out += len(data)
+            write_seconds[0] += time.perf_counter() - write_started
 
-        self.log_message("GET request: %s", response)
+        write_seconds = [0.0]
+        body = iter_request_body(self.rfile, int(self.headers.get('Content-Length', 0)),
+                                 'chunked' in self.headers.get('Transfer-Encoding', '').lower())
+        try:
+            for block in body:
+                write(stream.feed(block))
+            write(stream.finish(), final=True)
+        except ValueError as e:
+            # The rest of the request body is unread, so the connection cannot be reused
+            self.bytes_in = stream.bytes_in
+            if not started:
+                self.send_text(400, 'text/plain', str(e), close=True)
+                return
+            self.close_connection = True
+            self.log_error("POST /predict/batch failed after %d items: %s", stream.items, e)
+            record = stream.error_record(str(e))
+            if record is None:
+                return
+            write(record, final=True)
+
+        self.bytes_in = stream.bytes_in
+        self.phases = {'queue': 0.0, 'compute': stream.compute_seconds, 'write': write_seconds[0]}
+        self.log_message("POST /predict/batch: %d items", stream.items)
+
+    def do_GET(self):
+        status, content_type, response = get_response(self.path)
+
+        self.send_text(status, content_type, response)
+
+        # Stats and metrics bodies are too big for a log line
+        self.log_message("GET request: %s", response if content_type == 'text/plain' else self.path)
 
     def do_POST(self):
+        if self.path.split('?', 1)[0] == '/predict/batch':
+            self.predict_batch()
+            return
+
         content_length = int(self.headers['Content-Length'])
-        post_data = self.rfile.read(content_length).decode('utf-8')
-        query_params = urlparse.parse_qs(post_data)
+        post_data = self.rfile.read(content_length)
+        self.bytes_in = content_length
 
-        word1 = query_params.get('word1', [''])[0]
-        word2 = query_params.get('word2', [''])[0]
+        response, queue_seconds, compute_seconds = predict_pair(parse_form(post_data))
 
-        response = hello(word1, word2)
+        write_started = time.perf_counter()
+        self.send_text(200, 'text/plain', response)
+        self.phases = {'queue': queue_seconds, 'compute': compute_seconds,
+                       'write': time.perf_counter() - write_started}
 
-        self.send_response(200)
-        self.send_header('Content-type', 'text/plain')
-        self.end_headers()
-        self.wfile.write(response.encode('utf-8'))
+        self.log_message("POST request: %s", response)
+
+class OneShotHandler(MyHandler):
+    """MyHandler that closes every connection after one response, so --mode single cannot be held by one client."""
+    protocol_version = 'HTTP/1.0'
+
+class DrainingHTTPServer(HTTPServer):
+    """HTTPServer that drains keep-alive connections on stop().
+
+    Once stopping is set, responses carry "Connection: close" and connections waiting for their
+    next request are shut down, so serve_forever() is not held up by clients that stay connected.
+    """
+
+    def __init__(self, server_address, handler_class, bind_and_activate=True):
+        super().__init__(server_address, handler_class, bind_and_activate)
+        self.stopping = threading.Event()
+        self._idle = set()
+        self._idle_lock = threading.Lock()
+
+    def connection_idle(self, request):
+        """Register a connection waiting for its next request; False if it should close instead."""
+        with self._idle_lock:
+            if self.stopping.is_set():
+                return False
+            self._idle.add(request)
+            return True
+
+    def connection_busy(self, request):
+        with self._idle_lock:
+            self._idle.discard(request)
+
+    def stop(self):
+        """Stop accepting, close idle connections and return once serve_forever() has."""
+        with self._idle_lock:
+            self.stopping.set()
+            idle = list(self._idle)
+        for request in idle:
+            # Wakes the handler blocked reading the next request line with end-of-file
+            try:
+                request.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+        self.shutdown()
+
+class ThreadPoolHTTPServer(DrainingHTTPServer):
+    """HTTPServer that handles connections on a bounded pool of worker threads.
+
+    Once `workers` connections are being handled the accept loop stops accepting, so further
+    clients wait in the listen backlog instead of spawning unbounded threads. server_close()
+    waits up to drain_timeout seconds for them, then shuts down the connections still open.
+    """
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=16, drain_timeout=30, bind_and_activate=True):
+        super().__init__(server_address, handler_class, bind_and_activate)
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='predict')
+        self._slots = threading.BoundedSemaphore(workers)
+        self._connections = set()
 
-        self.log_message(f"POST request: {response}")
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        self._pool.submit(self._process_request_thread, request, client_address)
 
-def run(server_class=HTTPServer, handler_class=MyHandler, port=8080):
+    def _process_request_thread(self, request, client_address):
+        self._connections.add(request)
+        try:
+            self.finish_request(request, client_address)
+        except OSError:
+            # Connections that server_close() shut down after the drain timeout fail here; no need to report
+            if not self.stopping.is_set():
+                self.handle_error(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self._connections.discard(request)
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        # Every slot back in the semaphore is a worker that finished its connection
+        deadline = time.monotonic() + self.drain_timeout
+        for _ in range(self.workers):
+            if not self._slots.acquire(timeout=max(0, deadline - time.monotonic())):
+                break
+        else:
+            self._pool.shutdown(wait=True)
+            return
+        print(f'{len(self._connections)} connections still busy after {self.drain_timeout}s, closing them',
+              file=sys.stderr)
+        for request in list(self._connections):
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+def log_request(client_address, message, status=None, always=False):
+    """Write a request log line in the same format as BaseHTTPRequestHandler.log_message.
+
+    Lines are sampled by --log-sample-rate unless `always` is set or the status is 400 or above.
+    """
+    if REQUEST_LOG is None:
+        sys.stderr.write(f"{client_address[0]} - - [{time.strftime('%d/%b/%Y %H:%M:%S')}] {message}\n")
+    elif always or (status or 0) >= 400 or REQUEST_LOG.sampled():
+        REQUEST_LOG.write(f"{client_address[0]} - - [{time.strftime('%d/%b/%Y %H:%M:%S')}] {message}\n")
+
+async def handle_connection(reader, writer, stop=None, idle=None):
+    """Serve HTTP/1.1 requests on an asyncio stream until the connection should close.
+
+    While waiting for the next request the task is kept in the `idle` set, so a draining server can
+    cancel it; once `stop` is set the response in progress is the last one on the connection.
+    """
+    client_address = writer.get_extra_info('peername') or ('-',)
+    task = asyncio.current_task()
+    try:
+        for requests_handled in range(1, MAX_KEEPALIVE_REQUESTS + 1):
+            if idle is not None:
+                idle.add(task)
+            try:
+                request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+            except asyncio.CancelledError:
+                # Cancelled by a draining server while idle; returning keeps the traceback out of the log
+                return
+            finally:
+                if idle is not None:
+                    idle.discard(task)
+            if not request_line:
+                return
+            method, path, version = (request_line.decode('latin-1').rstrip('\r\n').split(' ') + ['', ''])[:3]
+            started = time.perf_counter()
+            record = {'status': None, 'bytes_in': 0, 'bytes_out': 0, 'phases': None}
+            if METRICS is not None:
+                METRICS.request_started()
+            try:
+                keep_alive = await handle_request(reader, writer, client_address, method, path, version,
+                                                  requests_handled < MAX_KEEPALIVE_REQUESTS and not (stop and stop.is_set()),
+                                                  record)
+            finally:
+                if METRICS is not None:
+                    METRICS.request_finished(method, path, record['status'], time.perf_counter() - started,
+                                             record['bytes_in'], record['bytes_out'], record['phases'])
+            if not keep_alive:
+                return
+    except (ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def handle_request(reader, writer, client_address, method, path, version, may_keep_alive, record):
+    """Read the headers and body of one request and answer it; return whether the connection stays open.
+
+    Fills `record` with the status, body byte counts and, for predictions, the phase timings.
+    """
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    # Clients such as curl send large bodies only after this (like BaseHTTPRequestHandler does)
+    if version == 'HTTP/1.1' and headers.get('expect', '').lower() == '100-continue':
+        writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+
+    connection = headers.get('connection', '').lower()
+    keep_alive = (connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive')
+    keep_alive = keep_alive and may_keep_alive
+
+    if method == 'POST' and path.split('?', 1)[0] == '/predict/batch':
+        keep_alive = await stream_batch(reader, writer, headers, version == 'HTTP/1.1', keep_alive, record)
+        error = record.get('error')
+        log_request(client_address, f"POST /predict/batch {record['status']}: {record.get('items', 0)} items"
+                    + (f", failed: {error}" if error else ''), record['status'], always=bool(error))
+        return keep_alive
+
+    content_type = 'text/plain'
+    queue_seconds = compute_seconds = 0.0
+    if method == 'GET':
+        status, content_type, response = get_response(path)
+        reason = 'OK'
+    elif method == 'POST':
+        post_data = await reader.readexactly(int(headers.get('content-length', 0)))
+        record['bytes_in'] = len(post_data)
+        pair = parse_form(post_data)
+        response = CACHE.get(pair) if CACHE is not None else None
+        if response is None and BATCHER is not None:
+            future = BATCHER.submit(pair)
+            response = await asyncio.wrap_future(future)
+            queue_seconds, compute_seconds = future.queue_seconds, future.compute_seconds
+        elif response is None:
+            # Inference blocks, so it runs on the default executor to keep the event loop serving other connections
+            compute_started = time.perf_counter()
+            response = (await asyncio.get_running_loop().run_in_executor(None, predict_batch, [pair]))[0]
+            compute_seconds = time.perf_counter() - compute_started
+        status, reason = 200, 'OK'
+    else:
+        status, reason, response = 501, 'Not Implemented', f"Unsupported method ({method})"
+        keep_alive = False
+
+    body = response.encode('utf-8')
+    write_started = time.perf_counter()
+    writer.write(f"HTTP/1.1 {status} {reason}\r\n"
+                 f"Content-type: {content_type}\r\n"
+                 f"Content-Length: {len(body)}\r\n"
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    record['status'] = status
+    record['bytes_out'] = len(body)
+    if method == 'POST':
+        record['phases'] = {'queue': queue_seconds, 'compute': compute_seconds,
+                            'write': time.perf_counter() - write_started}
+    log_request(client_address, f"{method} request: {response if content_type == 'text/plain' else path}", status)
+    return keep_alive
+
+async def stream_batch(reader, writer, headers, chunked, keep_alive, record):
+    """Serve /predict/batch on an asyncio stream; return whether the connection can be reused.
+
+    Also sets record['items'], and record['error'] when the body turned out malformed.
+    """
+    def head(status, reason, content_type, extra=''):
+        record['status'] = status
+        return (f"HTTP/1.1 {status} {reason}\r\nContent-type: {content_type}\r\n{extra}"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1')
+
+    try:
+        stream = BatchStream(headers.get('content-type', ''), chunk_size=STREAM_CHUNK_SIZE)
+    except ValueError as e:
+        keep_alive = False
+        message = str(e).encode('utf-8')
+        record['bytes_out'] = len(message)
+        record['error'] = str(e)
+        writer.write(head(415, 'Unsupported Media Type', 'text/plain', f"Content-Length: {len(message)}\r\n") + message)
+        await writer.drain()
+        return False
+    keep_alive = keep_alive and chunked
+    started = False
+    write_seconds = 0.0
+
+    async def write(data, final=False):
+        nonlocal started, write_seconds
+        if not data and not final:
+            return
+        write_started = time.perf_counter()
+        if not started:
+            started = True
+            writer.write(head(200, 'OK', stream.content_type, 'Transfer-Encoding: chunked\r\n' if chunked else ''))
+        if chunked:
+            if data:
+                writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+            if final:
+                writer.write(b'0\r\n\r\n')
+        else:
+            writer.write(data)
+        await writer.drain()
+        record['bytes_out'] += len(data)
+        write_seconds += time.perf_counter() - write_started
+
+    body = aiter_request_body(reader, int(headers.get('content-length', 0)),
+                              'chunked' in headers.get('transfer-encoding', '').lower())
+    # feed() and finish() run inference on complete chunks, so they go to the default executor like single requests
+    loop = asyncio.get_running_loop()
+    try:
+        async for block in body:
+            await write(await loop.run_in_executor(None, stream.feed, block))
+        await write(await loop.run_in_executor(None, stream.finish), final=True)
+    except ValueError as e:
+        keep_alive = False
+        record['bytes_in'] = stream.bytes_in
+        record['items'] = stream.items
+        record['error'] = str(e)
+        if not started:
+            message = str(e).encode('utf-8')
+            record['bytes_out'] = len(message)
+            writer.write(head(400, 'Bad Request', 'text/plain', f"Content-Length: {len(message)}\r\n") + message)
+            await writer.drain()
+            return False
+        error = stream.error_record(str(e))
+        if error is not None:
+            await write(error, final=True)
+    record['bytes_in'] = stream.bytes_in
+    record['items'] = stream.items
+    record['phases'] = {'queue': 0.0, 'compute': stream.compute_seconds, 'write': write_seconds}
+    return keep_alive
+
+async def serve_asyncio(port, backlog=128, sock=None, drain_timeout=30):
+    """Serve until SIGTERM, then stop accepting and wait up to drain_timeout for open requests."""
+    active = set()
+    idle = set()
+    stop = asyncio.Event()
+
+    async def tracked_connection(reader, writer):
+        task = asyncio.current_task()
+        active.add(task)
+        try:
+            await handle_connection(reader, writer, stop=stop, idle=idle)
+        finally:
+            active.discard(task)
+
+    if sock is None:
+        server = await asyncio.start_server(tracked_connection, '', port, backlog=backlog)
+    else:
+        server = await asyncio.start_server(tracked_connection, sock=sock)
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    await stop.wait()
+    server.close()
+    # Connections waiting for their next request have nothing in flight
+    for task in list(idle):
+        task.cancel()
+    if active:
+        await asyncio.wait(active, timeout=drain_timeout)
+
+def bind_socket(port, reuse_port=False, backlog=128):
+    """Create the listening socket, optionally with SO_REUSEPORT so several processes can bind it."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(('', port))
+    sock.listen(backlog)
+    return sock
+
+def run(server_class=DrainingHTTPServer, handler_class=MyHandler, port=8080, sock=None, **server_kwargs):
     server_address = ('', port)
-    httpd = server_class(server_address, handler_class)
-    print(f'Starting prediction server on port {port}...')
-    httpd.serve_forever()
+    if sock is None:
+        httpd = server_class(server_address, handler_class, **server_kwargs)
+    else:
+        httpd = server_class(sock.getsockname(), handler_class, bind_and_activate=False, **server_kwargs)
+        httpd.socket.close()
+        httpd.socket = sock
+    # stop() blocks until serve_forever() returns, so it cannot run in the signal handler itself
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=httpd.stop).start())
+    print(f'Starting prediction server on port {port} (pid {os.getpid()})...')
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+def run_asyncio(port=8080, sock=None, drain_timeout=30):
+    print(f'Starting asyncio prediction server on port {port} (pid {os.getpid()})...')
+    try:
+        asyncio.run(serve_asyncio(port, sock=sock, drain_timeout=drain_timeout))
+    except KeyboardInterrupt:
+        pass
+
+def serve(args, sock=None):
+    """Run one server process in the mode selected on the command line."""
+    global BATCHER, CACHE, METRICS, REQUEST_LOG
+    MyHandler.timeout = KEEPALIVE_TIMEOUT
+    METRICS = ServerMetrics()
+    REQUEST_LOG = RequestLog(sample_rate=args.log_sample_rate)
+    if args.cache_size > 0:
+        CACHE = PredictionCache(hello_batch, max_size=args.cache_size, ttl=args.cache_ttl)
+    # Threads do not survive fork(), so every worker process starts its own batcher
+    if args.batch_size > 1:
+        BATCHER = MicroBatcher(predict_batch, max_batch_size=args.batch_size, max_wait=args.batch_wait_ms / 1000)
+    try:
+        if args.mode == 'asyncio':
+            run_asyncio(port=args.port, sock=sock, drain_timeout=args.drain_timeout)
+        elif args.mode == 'threaded':
+            run(server_class=ThreadPoolHTTPServer, port=args.port, sock=sock, workers=args.workers,
+                drain_timeout=args.drain_timeout)
+        else:
+            run(handler_class=OneShotHandler, port=args.port, sock=sock)
+    finally:
+        if BATCHER is not None:
+            BATCHER.close()
+        REQUEST_LOG.close()
+
+def run_prefork(args):
+    """Fork args.processes workers that share the port, restart the ones that die, drain on SIGTERM.
+
+    Without --reuse-port the supervisor binds the socket once and the workers inherit it. With it,
+    every worker binds its own SO_REUSEPORT socket and the kernel spreads connections between them.
+    """
+    shared_sock = None if args.reuse_port else bind_socket(args.port)
+    if shared_sock is not None:
+        # Every worker wakes up for each new connection; non-blocking accept lets the losers go
+        # back to waiting instead of blocking in accept() where they would not notice SIGTERM
+        shared_sock.setblocking(False)
+    workers = {}  # pid -> (slot, start time)
+    restart_at = {}  # slot -> monotonic time of the next restart
+    crashes = {}  # slot -> consecutive quick exits, for restart backoff
+    stopping = False
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the supervisor, which sends SIGTERM
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                serve(args, shared_sock or bind_socket(args.port, reuse_port=True))
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        workers[pid] = (slot, time.monotonic())
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    print(f'Supervisor {os.getpid()} starting {args.processes} workers on port {args.port}...')
+    for slot in range(args.processes):
+        spawn(slot)
+
+    def reap():
+        """Return (pid, status) of an exited worker, or (0, 0) if none has exited or none is alive."""
+        try:
+            return os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            # Every worker is waiting out its restart backoff
+            return 0, 0
+
+    while not stopping:
+        pid, status = reap()
+        if pid in workers:
+            slot, started = workers.pop(pid)
+            crashes[slot] = crashes.get(slot, 0) + 1 if time.monotonic() - started < 5 else 0
+            delay = min(30, 0.5 * 2 ** crashes[slot]) if crashes[slot] else 0
+            print(f'Worker {pid} exited with code {os.waitstatus_to_exitcode(status)}, restarting in {delay:.1f}s',
+                  file=sys.stderr)
+            restart_at[slot] = time.monotonic() + delay
+        for slot, when in list(restart_at.items()):
+            if time.monotonic() >= when:
+                del restart_at[slot]
+                spawn(slot)
+        if not pid:
+            time.sleep(0.1)
+
+    print(f'Draining {len(workers)} workers...', file=sys.stderr)
+    for pid in workers:
+        os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + args.drain_timeout
+    while workers and time.monotonic() < deadline:
+        pid, _ = reap()
+        if pid:
+            workers.pop(pid, None)
+        else:
+            time.sleep(0.05)
+    for pid in workers:
+        print(f'Worker {pid} still busy after {args.drain_timeout}s, killing it', file=sys.stderr)
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Simple prediction server')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on')
+    parser.add_argument('--mode', choices=['threaded', 'asyncio', 'single'], default='threaded',
+                        help='threaded: bounded thread pool, asyncio: event loop, single: one request at a time')
+    parser.add_argument('--workers', type=int, default=16,
+                        help='Connections handled concurrently in threaded mode (per process)')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Pre-fork this many worker processes sharing the port')
+    parser.add_argument('--reuse-port', action='store_true',
+                        help='Let each worker process bind its own SO_REUSEPORT socket instead of inheriting one')
+    parser.add_argument('--drain-timeout', type=float, default=30,
+                        help='Seconds to let in-flight requests finish after SIGTERM')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='Micro-batch up to this many predictions per predict call (1 disables batching)')
+    parser.add_argument('--batch-wait-ms', type=float, default=5,
+                        help='Longest a prediction waits for its batch to fill up')
+    parser.add_argument('--keepalive-timeout', type=float, default=5,
+                        help='Close connections that stay idle this many seconds')
+    parser.add_argument('--max-keepalive-requests', type=int, default=1000,
+                        help='Close connections after this many requests')
+    parser.add_argument('--stream-chunk-size', type=int, default=256,
+                        help='Items predicted per predict call on /predict/batch')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='Cache up to this many predictions per process, least recently used evicted first (0 disables)')
+    parser.add_argument('--cache-ttl', type=float, default=300,
+                        help='Seconds a cached prediction stays valid')
+    parser.add_argument('--log-sample-rate', type=float, default=1.0,
+                        help='Fraction of requests written to the request log (responses with status 400 or above are always logged)')
+    parser.add_argument('--busy-ms', type=float, default=0,
+                        help='Burn this much CPU per predict call to emulate a real model')
+    parser.add_argument('--busy-item-ms', type=float, default=0,
+                        help='Burn this much extra CPU per predicted item')
+    return parser.parse_args()
 
 if __name__ == '__main__':
-    run()
\ No newline at end of file
+    args = parse_args()
+    BUSY_SECONDS = args.busy_ms / 1000
+    BUSY_ITEM_SECONDS = args.busy_item_ms / 1000
+    KEEPALIVE_TIMEOUT = args.keepalive_timeout
+    MAX_KEEPALIVE_REQUESTS = args.max_keepalive_requests
+    STREAM_CHUNK_SIZE = args.stream_chunk_size
+    if args.processes > 1:
+        run_prefork(args)
+    else:
+        serve(args)
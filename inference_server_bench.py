@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# python3 inference_server_bench.py --url http://127.0.0.1:8080/ --connections 64 --duration 10
+# python3 inference_server_bench.py --spawn "--mode threaded --workers 64" --spawn "--mode asyncio" --keepalive both
+# python3 inference_server_bench.py --spawn "--mode single" --spawn "--mode threaded" \
+#     --spawn "--processes 4" --spawn "--processes 4 --reuse-port" --busy-ms 2 --output /tmp/inference_bench.json
+#
+# Load generator for inference_server.py. Client connections are spread over several processes so
+# the generator itself is not capped by one GIL. With --spawn, each server configuration is started
+# on a free port, loaded, then sent SIGTERM while a second load (--drain-load) is still running, so
+# sigterm_exit_seconds shows whether it drains under load; results for every run are printed as JSON.
+# With --keepalive on, each client reuses one HTTP/1.1 connection; off opens one per request.
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse as urlparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from bench_common import percentiles
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'inference_server.py')
+
+REQUEST_BODY = urlparse.urlencode({'word1': 'hello', 'word2': 'world'}).encode()
+
+
+def client_process(host: str, port: int, path: str, connections: int, duration: float, keepalive: bool,
+                   results: 'multiprocessing.Queue') -> None:
+    """Run `connections` closed-loop client threads for `duration` seconds and report their latencies."""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    if not keepalive:
+        headers['Connection'] = 'close'
+
+    def loop() -> None:
+        local = []
+        failed = 0
+        # http.client reconnects by itself when the server closed the previous connection
+        conn = http.client.HTTPConnection(host, port, timeout=10)
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                conn.request('POST', path, body=REQUEST_BODY, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if not keepalive:
+                    conn.close()
+                if response.status != 200:
+                    failed += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                failed += 1
+                continue
+            local.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=loop) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((latencies, errors[0]))
+
+
+def run_load(url: str, connections: int, duration: float, procs: int, keepalive: bool = False) -> Dict[str, Any]:
+    """Drive the server at `url` with `connections` concurrent clients for `duration` seconds."""
+    parsed = urlparse.urlparse(url)
+    procs = max(1, min(procs, connections))
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=client_process,
+                           args=(parsed.hostname, parsed.port or 80, parsed.path or '/',
+                                 connections // procs + (i < connections % procs), duration, keepalive, results))
+               for i in range(procs)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    latencies: List[float] = []
+    errors = 0
+    for _ in workers:
+        worker_latencies, worker_errors = results.get()
+        latencies.extend(worker_latencies)
+        errors += worker_errors
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'latency': percentiles(latencies)
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(server_args: str, busy_ms: float) -> Tuple[subprocess.Popen, str]:
+    """Start inference_server.py with extra arguments on a free port and wait until it answers."""
+    port = free_port()
+    command = [sys.executable, SCRIPT_PATH, '--port', str(port), '--busy-ms', str(busy_ms)] + shlex.split(server_args)
+    proc = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/"
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            conn.close()
+            return proc, url
+        except OSError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"Server did not start: {' '.join(command)}")
+
+
+def stop_server(proc: subprocess.Popen) -> Optional[float]:
+    """Send SIGTERM and return how long the server took to drain and exit (None if it had to be killed)."""
+    started = time.perf_counter()
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=60)
+        return round(time.perf_counter() - started, 3)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        return None
+
+
+def stop_server_under_load(proc: subprocess.Popen, url: str, connections: int, procs: int, keepalive: bool,
+                           load_seconds: float) -> Optional[float]:
+    """Send SIGTERM a third of the way into `load_seconds` of load and return how long the server took to exit.
+
+    A server that keeps answering requests on open connections after SIGTERM only exits once the
+    load stops, so an exit time near two thirds of load_seconds means it did not drain.
+    """
+    load = threading.Thread(target=run_load, args=(url, connections, load_seconds, procs, keepalive))
+    load.start()
+    time.sleep(load_seconds / 3)
+    try:
+        return stop_server(proc)
+    finally:
+        load.join()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Load generator for inference_server.py')
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8080/', help='Server to load when --spawn is not given')
+    parser.add_argument('--spawn', action='append', metavar='ARGS',
+                        help='Start inference_server.py with these arguments and load it (repeatable)')
+    parser.add_argument('--busy-ms', type=float, default=0, help='--busy-ms passed to spawned servers')
+    parser.add_argument('--connections', type=int, default=64, help='Concurrent closed-loop clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load per run')
+    parser.add_argument('--warmup', type=float, default=1, help='Seconds of unmeasured load before each run')
+    parser.add_argument('--client-procs', type=int, default=os.cpu_count() or 1,
+                        help='Processes the client connections are spread over')
+    parser.add_argument('--keepalive', choices=['off', 'on', 'both'], default='both',
+                        help='Reuse one connection per client (on), reconnect per request (off), or run both')
+    parser.add_argument('--drain-load', type=float, default=3,
+                        help='Seconds of load spawned servers get SIGTERM during (a third of the way in); '
+                             '0 sends it after the measured run instead')
+    parser.add_argument('--output', type=str, help='Also write the JSON results to this file')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': sys.version.split()[0],
+        'cpus': os.cpu_count(),
+        'config': vars(args),
+        'runs': []
+    }
+
+    keepalive_modes = {'off': [False], 'on': [True], 'both': [False, True]}[args.keepalive]
+    for server_args in args.spawn or [None]:
+        for keepalive in keepalive_modes:
+            proc = None
+            url = args.url
+            if server_args is not None:
+                proc, url = spawn_server(server_args, args.busy_ms)
+            try:
+                if args.warmup > 0:
+                    run_load(url, args.connections, args.warmup, args.client_procs, keepalive)
+                run = run_load(url, args.connections, args.duration, args.client_procs, keepalive)
+                if proc and args.drain_load > 0:
+                    drain_seconds = stop_server_under_load(proc, url, args.connections, args.client_procs,
+                                                           keepalive, args.drain_load)
+                    proc = None
+            finally:
+                if proc:
+                    drain_seconds = stop_server(proc)
+            run['server'] = server_args if server_args is not None else url
+            run['keepalive'] = keepalive
+            if server_args is not None:
+                run['sigterm_exit_seconds'] = drain_seconds
+                run['sigterm_under_load'] = args.drain_load > 0
+            results['runs'].append(run)
+            print(f"{run['server']} (keepalive {'on' if keepalive else 'off'}): {run['requests_per_sec']} req/s, "
+                  f"p99 {run['latency'].get('p99_ms')} ms, {run['errors']} errors"
+                  + (f", exit {drain_seconds}s after SIGTERM" if server_args is not None else ''), file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,637 @@
 #!/usr/bin/env python3
-# pip install requests, pygments
+# pip install requests, pygments (optional: numpy for --format npz/csv/parquet, pyarrow for --format parquet, pyyaml for YAML --queries-file)
 # python3 prometheus_query.py --url http://prometheus-operator.monitoring.svc.cluster.local:9090 --query 'up' --export
+# python3 prometheus_query.py --url http://localhost:9090 --query 'up' --range --start 2023-01-01T00:00:00Z --end 2023-01-31T00:00:00Z --step 15s --no-cache --chunk --parallel 8
+# python3 prometheus_query.py --url http://localhost:9090 --query 'up' --range --no-cache --format npz
+# python3 prometheus_query.py --url http://localhost:9090 --queries-file capacity_report.yaml --concurrency 16
+# python3 prometheus_query.py --url http://localhost:9090 --query 'runai_gpu_memory_used_mebibytes_per_workload' --watch 15
+# python3 prometheus_query.py --shard cluster-a=http://prom-a:9090 --shard cluster-b=http://prom-b:9090 --query 'up'
+# python3 prometheus_query.py --url http://localhost:9090 --query 'runai_gpu_memory_used_mebibytes_per_workload' --range --start 2023-01-01T00:00:00Z --max-points 500 --over-time max --summary
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+import re
+import os
+import gzip
+import hashlib
+import math
+import time
+import threading
+import codecs
+import csv
+import zipfile
+import sys
+import importlib
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 import urllib.parse
 import argparse
-from pygments import highlight
-from pygments.lexers import JsonLexer
-from pygments.formatters import TerminalFormatter
 
-class PrometheusQuery:
-    def __init__(self, base_url: str):
+# Output larger than this is printed without syntax highlighting, which is far too slow for it
+HIGHLIGHT_MAX_BYTES = 1024 * 1024
+
+def _optional_import(module: str, package: str, purpose: str):
+    """
+    Import an optional dependency on first use, so CLI startup only pays for what a run needs.
+    
+    Args:
+        module (str): Module to import (e.g., 'pyarrow.parquet')
+        package (str): pip package that provides it, for the error message
+        purpose (str): What the dependency is needed for, for the error message
+        
+    Returns:
+        module: The imported module
+        
+    Raises:
+        Exception: If the dependency is not installed
+    """
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise Exception(f"{package} is required for {purpose} (pip install {package})")
+
+# Prometheus rejects range queries that would return more than this many points per series
+MAX_POINTS_PER_SERIES = 11000
+
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 31536000}
+_DURATION_RE = re.compile(r'(\d+)(ms|s|m|h|d|w|y)')
+
+def parse_step(step: str) -> float:
+    """
+    Convert a Prometheus step/duration string to seconds.
+    
+    Args:
+        step (str): A float number of seconds (e.g., '15', '0.5') or a duration (e.g., '15s', '1m', '1h30m')
+        
+    Returns:
+        float: The step width in seconds
+        
+    Raises:
+        ValueError: If the step cannot be parsed or is not positive
+    """
+    step = str(step).strip()
+    try:
+        seconds = float(step)
+    except ValueError:
+        parts = _DURATION_RE.findall(step)
+        if not parts or ''.join(n + u for n, u in parts) != step:
+            raise ValueError(f"Invalid step: {step}")
+        seconds = sum(int(n) * _DURATION_UNITS[u] for n, u in parts)
+    if seconds <= 0:
+        raise ValueError(f"Step must be positive: {step}")
+    return seconds
+
+def split_range(start: float, end: float, step: float,
+                max_points: int = MAX_POINTS_PER_SERIES) -> List[Tuple[float, float]]:
+    """
+    Split [start, end] into sub-windows of at most max_points evaluation steps each.
+    
+    Every sub-window starts on the same step grid as the full range (start + k * step), and
+    consecutive windows do not share an evaluation timestamp.
+    
+    Args:
+        start (float): Range start as a unix timestamp
+        end (float): Range end as a unix timestamp
+        step (float): Step width in seconds
+        max_points (int): Maximum number of points per series in one sub-window
+        
+    Returns:
+        list: (start, end) unix timestamp pairs, in order
+    """
+    if max_points < 1:
+        raise ValueError("max_points must be at least 1")
+    total_points = int((end - start) // step) + 1 if end >= start else 0
+    windows = []
+    # Offsets are computed from the range start to avoid accumulating float error
+    for first in range(0, total_points, max_points):
+        last = min(first + max_points, total_points) - 1
+        windows.append((start + first * step, min(start + last * step, end)))
+    return windows
+
+def merge_matrix_results(responses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Stitch the 'matrix' results of consecutive range query responses back together per series.
+    
+    Args:
+        responses (list): Range query responses, ordered by time
+        
+    Returns:
+        dict: A single response with one entry per series and boundary samples deduplicated
+    """
+    series: Dict[Tuple[Tuple[str, str], ...], Dict[str, Any]] = {}
+    warnings: List[str] = []
+    for response in responses:
+        for warning in response.get('warnings', []):
+            if warning not in warnings:
+                warnings.append(warning)
+        for item in response.get('data', {}).get('result', []):
+            key = tuple(sorted(item['metric'].items()))
+            merged = series.get(key)
+            if merged is None:
+                series[key] = {'metric': item['metric'], 'values': list(item.get('values', []))}
+                continue
+            values = merged['values']
+            last_ts = values[-1][0] if values else None
+            for sample in item.get('values', []):
+                if last_ts is None or sample[0] > last_ts:
+                    values.append(sample)
+                    last_ts = sample[0]
+
+    merged_response = {
+        'status': 'success',
+        'data': {'resultType': 'matrix', 'result': list(series.values())}
+    }
+    if warnings:
+        merged_response['warnings'] = warnings
+    return merged_response
+
+def clip_matrix_result(response: Dict[str, Any], start: float, end: float) -> Dict[str, Any]:
+    """
+    Drop samples outside [start, end] from a 'matrix' query response.
+    
+    Args:
+        response (dict): A range query response
+        start (float): Earliest timestamp to keep, as a unix timestamp
+        end (float): Latest timestamp to keep, as a unix timestamp
+        
+    Returns:
+        dict: A shallow copy of the response holding only the samples within the window
+    """
+    result = []
+    for item in response.get('data', {}).get('result', []):
+        values = [sample for sample in item.get('values', []) if start <= sample[0] <= end]
+        if values:
+            result.append({'metric': item['metric'], 'values': values})
+    clipped = dict(response)
+    clipped['data'] = {'resultType': 'matrix', 'result': result}
+    return clipped
+
+_RESULT_TYPE_RE = re.compile(r'"resultType"\s*:\s*"(\w+)"')
+_RESULT_START_RE = re.compile(r'"result"\s*:\s*')
+
+def iter_result_items(chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """
+    Incrementally decode the 'data.result' items of a Prometheus API response.
+    
+    Only the item being decoded is held in memory, so a response with many large series can be
+    processed one series at a time. Scalar and string results are yielded as a single item
+    shaped like a vector sample with empty labels.
+    
+    Args:
+        chunks (iterable): Raw response body chunks (e.g., response.iter_content())
+        
+    Yields:
+        dict: One result item, e.g. {'metric': {...}, 'values': [[ts, "v"], ...]}
+        
+    Raises:
+        Exception: If the response reports an error or is not a valid query response
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill() -> None:
+        # Drop consumed text so the buffer only holds the item being decoded, then at least double
+        # the pending text so that re-decoding a large item after each read stays linear overall
+        nonlocal buf, pos, eof
+        pending = [buf[pos:]]
+        target = max(len(pending[0]), 1) * 2
+        size = len(pending[0])
+        for chunk in chunks:
+            if chunk:
+                pending.append(text.decode(chunk))
+                size += len(pending[-1])
+                if size >= target:
+                    break
+        else:
+            pending.append(text.decode(b'', final=True))
+            eof = True
+        buf = ''.join(pending)
+        pos = 0
+
+    # Find "resultType" and the start of "result"
+    while True:
+        match = _RESULT_START_RE.search(buf, pos)
+        if match and match.end() < len(buf):
+            break
+        if eof:
+            try:
+                response = json.loads(buf)
+            except ValueError:
+                raise Exception("Invalid response: no result found")
+            raise Exception(f"Query failed: {response.get('errorType', 'error')}: {response.get('error', 'unknown error')}")
+        fill()
+    type_match = _RESULT_TYPE_RE.search(buf, 0, match.start())
+    result_type = type_match.group(1) if type_match else 'vector'
+    pos = match.end()
+
+    if result_type in ('scalar', 'string'):
+        while True:
+            try:
+                value, pos = decoder.raw_decode(buf, pos)
+                break
+            except ValueError:
+                if eof:
+                    raise Exception("Invalid response: truncated result")
+                fill()
+        yield {'metric': {}, 'value': value}
+        return
+
+    if buf[pos] != '[':
+        raise Exception("Invalid response: result is not a list")
+    pos += 1
+    while True:
+        # Skip separators between items
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            fill()
+        if pos >= len(buf):
+            raise Exception("Invalid response: truncated result")
+        if buf[pos] == ']':
+            return
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                break
+            except ValueError:
+                if eof:
+                    raise Exception("Invalid response: truncated result")
+                fill()
+        pos = end
+        yield item
+
+def item_to_arrays(item: Dict[str, Any]) -> Tuple[Dict[str, str], Any, Any]:
+    """
+    Convert one 'matrix' or 'vector' result item to NumPy arrays.
+    
+    Args:
+        item (dict): A result item with either 'values' (matrix) or 'value' (vector)
+        
+    Returns:
+        tuple: (metric labels, float64 timestamps, float64 values)
+    """
+    np = _optional_import('numpy', 'numpy', 'columnar output')
+    samples = item['values'] if 'values' in item else [item['value']]
+    timestamps = np.fromiter((sample[0] for sample in samples), dtype=np.float64, count=len(samples))
+    # float() understands Prometheus' "NaN", "+Inf" and "-Inf" sample values
+    values = np.fromiter((float(sample[1]) for sample in samples), dtype=np.float64, count=len(samples))
+    return item.get('metric', {}), timestamps, values
+
+def format_metric(metric: Dict[str, str]) -> str:
+    """Format a label set the way Prometheus displays it, e.g. up{job="node"}."""
+    name = metric.get('__name__', '')
+    labels = ','.join(f'{k}={json.dumps(v)}' for k, v in sorted(metric.items()) if k != '__name__')
+    return f"{name}{{{labels}}}" if labels or not name else name
+
+def render_plain(result: Dict[str, Any], out=None) -> None:
+    """
+    Print a query result as plain text, one line per sample, without building the JSON document.
+    
+    Args:
+        result (dict): A query response
+        out (file, optional): Where to write, defaults to sys.stdout
+    """
+    out = out or sys.stdout
+    data = result.get('data', {})
+    items = data.get('result', [])
+    if data.get('resultType') in ('scalar', 'string'):
+        items = [{'metric': {}, 'value': items}]
+    for item in items:
+        name = format_metric(item.get('metric', {}))
+        if 'values' in item:
+            out.write(f"{name}\n")
+            out.write(''.join(f"  {value} @{ts}\n" for ts, value in item['values']))
+        else:
+            ts, value = item['value']
+            out.write(f"{name} {value} @{ts}\n")
+
+def export_npz(series: Iterable[Tuple[Dict[str, str], Any, Any]], filename: str) -> int:
+    """
+    Write series to a NumPy .npz archive one series at a time.
+    
+    The archive holds timestamps_<i> and values_<i> arrays per series plus a 'metrics' array
+    of JSON-encoded label sets, and can be read back with numpy.load().
+    
+    Returns:
+        int: The number of series written
+    """
+    np = _optional_import('numpy', 'numpy', 'npz output')
+    metrics = []
+    with zipfile.ZipFile(filename, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for i, (metric, timestamps, values) in enumerate(series):
+            for name, array in ((f'timestamps_{i}', timestamps), (f'values_{i}', values)):
+                with archive.open(f'{name}.npy', 'w', force_zip64=True) as f:
+                    np.lib.format.write_array(f, array, allow_pickle=False)
+            metrics.append(json.dumps(metric, sort_keys=True))
+        with archive.open('metrics.npy', 'w') as f:
+            np.lib.format.write_array(f, np.array(metrics, dtype=str), allow_pickle=False)
+    return len(metrics)
+
+def export_csv(series: Iterable[Tuple[Dict[str, str], Any, Any]], filename: str) -> int:
+    """
+    Write series to a long-format CSV file with metric, timestamp and value columns.
+    
+    Returns:
+        int: The number of series written
+    """
+    count = 0
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['metric', 'timestamp', 'value'])
+        for metric, timestamps, values in series:
+            name = format_metric(metric)
+            writer.writerows((name, ts, value) for ts, value in zip(timestamps.tolist(), values.tolist()))
+            count += 1
+    return count
+
+def export_parquet(series: Iterable[Tuple[Dict[str, str], Any, Any]], filename: str) -> int:
+    """
+    Write series to a Parquet file with one row group per series.
+    
+    Returns:
+        int: The number of series written
+    """
+    pa = _optional_import('pyarrow', 'pyarrow', 'Parquet output')
+    pq = _optional_import('pyarrow.parquet', 'pyarrow', 'Parquet output')
+    schema = pa.schema([('metric', pa.string()), ('timestamp', pa.float64()), ('value', pa.float64())])
+    count = 0
+    with pq.ParquetWriter(filename, schema) as writer:
+        for metric, timestamps, values in series:
+            name = format_metric(metric)
+            table = pa.table({
+                'metric': pa.array([name] * len(timestamps), type=pa.string()),
+                'timestamp': timestamps,
+                'value': values
+            }, schema=schema)
+            writer.write_table(table)
+            count += 1
+    return count
+
+EXPORTERS = {'npz': export_npz, 'csv': export_csv, 'parquet': export_parquet}
+
+# Steps tried by choose_step, finest first
+NICE_STEPS = ['15s', '30s', '1m', '2m', '5m', '10m', '15m', '30m', '1h', '2h', '3h', '6h', '12h', '1d', '2d', '7d']
+
+OVER_TIME_FUNCTIONS = ('avg', 'min', 'max', 'sum', 'count', 'last', 'stddev', 'quantile')
+
+_SELECTOR_RE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[^{}]*\})?$')
+
+def choose_step(start: datetime, end: datetime, max_points: int, min_step: str = '15s') -> str:
+    """
+    Pick the finest step from NICE_STEPS that keeps a range query within a point budget.
+    
+    Args:
+        start (datetime): Start time for the query range
+        end (datetime): End time for the query range
+        max_points (int): Maximum number of points per series
+        min_step (str): Never return a step finer than this (e.g., the scrape interval)
+        
+    Returns:
+        str: A step string, e.g. '5m'. Falls back to an exact step in seconds when the range
+             needs something coarser than the largest nice step.
+    """
+    if max_points < 2:
+        raise ValueError("max_points must be at least 2")
+    needed = max((end.timestamp() - start.timestamp()) / (max_points - 1), parse_step(min_step))
+    for step in NICE_STEPS:
+        if parse_step(step) >= needed:
+            return step
+    return f"{math.ceil(needed)}s"
+
+def over_time_query(query: str, function: str, window: str, quantile: float = 0.95) -> str:
+    """
+    Wrap a query in a *_over_time function so Prometheus aggregates each step window server-side.
+    
+    Plain selectors use a range vector (metric{...}[window]); anything else becomes a subquery.
+    
+    Args:
+        query (str): The PromQL query to wrap
+        function (str): One of OVER_TIME_FUNCTIONS (e.g., 'max' for max_over_time)
+        window (str): The window each output point covers, normally the query step
+        quantile (float): The quantile used when function is 'quantile'
+        
+    Returns:
+        str: The rewritten query
+    """
+    if function not in OVER_TIME_FUNCTIONS:
+        raise ValueError(f"Unsupported over_time function: {function}")
+    query = query.strip()
+    selector = f"{query}[{window}]" if _SELECTOR_RE.match(query) else f"({query})[{window}:]"
+    if function == 'quantile':
+        return f"quantile_over_time({quantile}, {selector})"
+    return f"{function}_over_time({selector})"
+
+def summarize_series(items: List[Dict[str, Any]],
+                     percentiles: Iterable[float] = (50, 95, 99)) -> List[Dict[str, Any]]:
+    """
+    Compute min/max/mean/percentiles per series with vectorized NumPy operations.
+    
+    Series are padded with NaN into one (series x samples) matrix, so every statistic is a single
+    reduction over all series. NaN samples are ignored.
+    
+    Args:
+        items (list): 'matrix' or 'vector' result items
+        percentiles (iterable): Percentiles to compute, between 0 and 100
+        
+    Returns:
+        list: One dict per series with 'metric', 'samples', 'min', 'max', 'mean' and 'p<N>' keys
+    """
+    np = _optional_import('numpy', 'numpy', 'summaries')
+    percentiles = list(percentiles)
+    arrays = [item_to_arrays(item) for item in items]
+    if not arrays:
+        return []
+    width = max(len(values) for _, _, values in arrays)
+    matrix = np.full((len(arrays), max(width, 1)), np.nan)
+    for row, (_, _, values) in enumerate(arrays):
+        matrix[row, :len(values)] = values
+
+    samples = np.count_nonzero(~np.isnan(matrix), axis=1)
+    # Rows that are all NaN would warn in the nan* reductions; reduce a row of zeros instead and report None for them below
+    safe = np.where(samples[:, None] > 0, matrix, 0.0)
+    stats = {
+        'min': np.nanmin(safe, axis=1),
+        'max': np.nanmax(safe, axis=1),
+        'mean': np.nanmean(safe, axis=1),
+    }
+    if percentiles:
+        for p, column in zip(percentiles, np.nanpercentile(safe, percentiles, axis=1)):
+            stats[f"p{p:g}"] = column
+
+    summaries = []
+    for row, (metric, _, _) in enumerate(arrays):
+        summary = {'metric': metric, 'samples': int(samples[row])}
+        for name, column in stats.items():
+            summary[name] = float(column[row]) if samples[row] else None
+        summaries.append(summary)
+    return summaries
+
+def parse_time(value: Any, default: datetime, what: str = 'time') -> datetime:
+    """
+    Parse an ISO timestamp (a trailing 'Z' is accepted), falling back to default when empty.
+    
+    datetime values, which YAML produces for unquoted timestamps, are returned as they are; naive
+    ones are UTC, as the YAML spec defines them. Any other type raises a ValueError naming `what`.
+    """
+    if value is None or value == '':
+        return default
+    if isinstance(value, datetime):
+        return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    raise ValueError(f"{what} must be an ISO timestamp, got {type(value).__name__} {value!r}")
+
+def load_queries_file(path: str, range_query: bool = False, start: Optional[str] = None,
+                      end: Optional[str] = None, step: str = '1m') -> List[Dict[str, Any]]:
+    """
+    Load batch queries from a YAML or JSONL file.
+    
+    YAML files hold a list (or a mapping with a 'queries' list); JSONL files hold one entry per line.
+    Each entry is either a PromQL string or a mapping with 'query' and optional 'name', 'range',
+    'start', 'end', 'step' and 'params' keys. Missing keys fall back to the given defaults.
+    
+    Example YAML:
+        - name: gpu-memory
+          query: runai_gpu_memory_used_mebibytes_per_workload{workload_name="shared-inpaint-creative-inference"}
+        - query: up
+          range: true
+          step: 5m
+    
+    Args:
+        path (str): Path to a .yaml/.yml or .jsonl file
+        range_query (bool): Default for the 'range' key
+        start (str, optional): Default range start (ISO format), one hour ago if unset
+        end (str, optional): Default range end (ISO format), now if unset
+        step (str): Default range step
+        
+    Returns:
+        list: Query entries ready for PrometheusQuery.query_batch
+    """
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            yaml = _optional_import('yaml', 'pyyaml', 'YAML query files')
+            entries = yaml.safe_load(f) or []
+            if isinstance(entries, dict):
+                entries = entries.get('queries', [])
+        else:
+            entries = [json.loads(line) for line in f if line.strip()]
+
+    now = datetime.now()
+    queries = []
+    for i, entry in enumerate(entries):
+        if isinstance(entry, str):
+            entry = {'query': entry}
+        if not isinstance(entry, dict) or 'query' not in entry:
+            raise ValueError(f"Entry {i} in {path} has no 'query'")
+        queries.append({
+            'name': entry.get('name', entry['query']),
+            'query': entry['query'],
+            'range': entry.get('range', range_query),
+            'start': parse_time(entry.get('start', start), now - timedelta(hours=1), f"Entry {i} in {path}: 'start'"),
+            'end': parse_time(entry.get('end', end), now, f"Entry {i} in {path}: 'end'"),
+            'step': entry.get('step', step),
+            'params': entry.get('params')
+        })
+    return queries
+
+class RangeQueryCache:
+    """
+    On-disk cache of completed range query blocks.
+    
+    A block covers block_points steps on an absolute step grid, so the same block is reused by every
+    query window that overlaps it. Only blocks that ended more than settle seconds ago are stored;
+    newer data is always fetched live. Files are evicted least-recently-used first once the cache
+    grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 256 * 1024 * 1024,
+                 block_points: int = 1000, settle: float = 300):
         """
-        Initialize the PrometheusQuery client.
+        Initialize the cache.
         
         Args:
-            base_url (str): The base URL of your Prometheus server (e.g., 'http://localhost:9090')
+            cache_dir (str, optional): Directory for cache files (default: $PROMETHEUS_QUERY_CACHE_DIR or ~/.cache/prometheus_query)
+            max_bytes (int): Maximum total size of the cache files
+            block_points (int): Number of steps per cached block, at most MAX_POINTS_PER_SERIES
+            settle (float): Seconds after which a block's data is considered final
         """
-        self.base_url = base_url.rstrip('/')
-        self.api_url = f"{self.base_url}/api/v1"
+        if not 1 <= block_points <= MAX_POINTS_PER_SERIES:
+            raise ValueError(f"block_points must be between 1 and {MAX_POINTS_PER_SERIES}")
+        self.cache_dir = cache_dir or os.environ.get(
+            'PROMETHEUS_QUERY_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'prometheus_query'))
+        self.max_bytes = max_bytes
+        self.block_points = block_points
+        self.settle = settle
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, query: str, step: float, block_start: float, params: Optional[Dict[str, Any]],
+              source: str) -> str:
+        key = json.dumps([source, query, step, block_start, params or {}], sort_keys=True, default=str)
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json.gz')
+
+    def get(self, query: str, step: float, block_start: float,
+            params: Optional[Dict[str, Any]] = None, source: str = '') -> Optional[Dict[str, Any]]:
+        """Return the cached response for a block from the given server (source), or None on a miss."""
+        path = self._path(query, step, block_start, params, source)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                response = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Touch the file so eviction sees it as recently used
+        os.utime(path)
+        return response
+
+    def put(self, query: str, step: float, block_start: float, response: Dict[str, Any],
+            params: Optional[Dict[str, Any]] = None, source: str = '') -> None:
+        """Store the response for a completed block and evict old blocks if over budget."""
+        path = self._path(query, step, block_start, params, source)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(response, f)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Delete least-recently-used cache files until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith('.json.gz'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+class PrometheusQueryBase:
+    """
+    Query methods shared by PrometheusQuery and FederatedPrometheusQuery.
+    
+    They only rely on the query(), query_range_cached() and close() methods and the pool_size
+    attribute that both clients provide, so they behave the same against one server or many.
+    """
+
+    def __enter__(self) -> 'PrometheusQueryBase':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def _validate_query(self, query: str) -> None:
         """
@@ -46,6 +657,181 @@ class PrometheusQuery:
                 if query.count('"') % 2 != 0:
                     raise ValueError("Mismatched quotes in query")
 
+    def query_range_summary(self, query: str, start: datetime, end: datetime, max_points: int = 250,
+                            over_time: Optional[str] = None, percentiles: Iterable[float] = (50, 95, 99),
+                            min_step: str = '15s', params: Optional[Dict[str, Any]] = None,
+                            parallel: int = 4) -> List[Dict[str, Any]]:
+        """
+        Summarize a range query per series while transferring as few samples as possible.
+        
+        The step is the finest one that fits max_points (see choose_step). With over_time set, the
+        query is rewritten so each returned point already aggregates its whole step window
+        server-side (e.g., 'max' keeps spikes that plain sampling at a coarse step would miss).
+        
+        Args:
+            query (str): The PromQL query to execute
+            start (datetime): Start time for the query range
+            end (datetime): End time for the query range
+            max_points (int): Maximum number of points per series to fetch
+            over_time (str, optional): One of OVER_TIME_FUNCTIONS to aggregate each step server-side
+            percentiles (iterable): Percentiles to compute, between 0 and 100
+            min_step (str): Never use a step finer than this
+            params (dict, optional): Additional query parameters
+            parallel (int): Maximum number of requests in flight
+            
+        Returns:
+            list: One summary dict per series (see summarize_series)
+        """
+        step = choose_step(start, end, max_points, min_step=min_step)
+        if over_time:
+            query = over_time_query(query, over_time, step)
+        response = self.query_range_cached(query, start, end, step=step, params=params, parallel=parallel)
+        return summarize_series(response['data']['result'], percentiles)
+
+    def watch(self, query: str, interval: float, params: Optional[Dict[str, Any]] = None,
+              max_ticks: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Repeatedly execute an instant query and yield only the series that changed.
+        
+        Ticks are scheduled on a fixed grid from the first query (start + k * interval), so slow
+        queries do not make the schedule drift; ticks missed while a query was running are skipped.
+        
+        Args:
+            query (str): The PromQL query to execute
+            interval (float): Seconds between ticks
+            params (dict, optional): Additional query parameters
+            max_ticks (int, optional): Stop after this many ticks instead of running forever
+            
+        Yields:
+            list: Changes for one tick. Each change has 'change' ('new', 'changed', 'gone' or 'error'),
+                  'metric', 'value', 'previous' and 'rate' (per second, from sample timestamps),
+                  or 'error' for a failed tick
+        """
+        if interval <= 0:
+            raise ValueError("Watch interval must be positive")
+        last: Dict[Tuple[Tuple[str, str], ...], Tuple[Dict[str, str], float, float]] = {}
+        started = time.monotonic()
+        tick = 0
+        while max_ticks is None or tick < max_ticks:
+            try:
+                response = self.query(query, params=params)
+            except Exception as e:
+                yield [{'change': 'error', 'error': str(e)}]
+            else:
+                data = response.get('data', {})
+                items = data.get('result', [])
+                if data.get('resultType') == 'scalar':
+                    items = [{'metric': {}, 'value': items}]
+
+                current = {}
+                changes = []
+                for item in items:
+                    key = tuple(sorted(item['metric'].items()))
+                    ts, value = float(item['value'][0]), float(item['value'][1])
+                    current[key] = (item['metric'], ts, value)
+                    previous = last.get(key)
+                    if previous is None:
+                        changes.append({'change': 'new', 'metric': item['metric'], 'value': value,
+                                        'previous': None, 'rate': None})
+                    elif previous[2] != value and not (math.isnan(value) and math.isnan(previous[2])):
+                        elapsed = ts - previous[1]
+                        changes.append({'change': 'changed', 'metric': item['metric'], 'value': value,
+                                        'previous': previous[2],
+                                        'rate': (value - previous[2]) / elapsed if elapsed > 0 else None})
+                for key, (metric, _, value) in last.items():
+                    if key not in current:
+                        changes.append({'change': 'gone', 'metric': metric, 'value': None,
+                                        'previous': value, 'rate': None})
+                last = current
+                yield changes
+
+            tick += 1
+            if max_ticks is not None and tick >= max_ticks:
+                break
+            # Sleep until the next tick on the fixed schedule, skipping any that were missed
+            elapsed = time.monotonic() - started
+            tick = max(tick, math.ceil(elapsed / interval))
+            time.sleep(max(0.0, started + tick * interval - time.monotonic()))
+
+    def query_batch(self, queries: List[Dict[str, Any]], concurrency: int = 8,
+                    parallel: int = 1) -> List[Dict[str, Any]]:
+        """
+        Execute many queries concurrently over a bounded thread pool.
+        
+        A failing query does not stop the batch; its error is recorded in its result entry.
+        
+        Args:
+            queries (list): Entries with 'query' and optional 'name', 'range', 'start', 'end', 'step'
+                            and 'params' keys (see load_queries_file)
+            concurrency (int): Maximum number of queries in flight, capped at the pool size
+            parallel (int): Sub-window requests per range query (see query_range_cached)
+            
+        Returns:
+            list: One entry per query, in input order, with 'name', 'query', 'status',
+                  'latency_seconds' and either 'result' or 'error'
+        """
+        def run(entry: Dict[str, Any]) -> Dict[str, Any]:
+            started = time.perf_counter()
+            outcome = {'name': entry.get('name', entry['query']), 'query': entry['query']}
+            try:
+                if entry.get('range'):
+                    outcome['result'] = self.query_range_cached(
+                        entry['query'], entry['start'], entry['end'], step=entry.get('step', '1m'),
+                        params=entry.get('params'), parallel=parallel)
+                else:
+                    outcome['result'] = self.query(entry['query'], params=entry.get('params'))
+                outcome['status'] = 'success'
+            except Exception as e:
+                outcome['status'] = 'error'
+                outcome['error'] = str(e)
+            outcome['latency_seconds'] = round(time.perf_counter() - started, 6)
+            return outcome
+
+        workers = max(1, min(concurrency, len(queries), self.pool_size))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(run, queries))
+
+class PrometheusQuery(PrometheusQueryBase):
+    def __init__(self, base_url: str, pool_size: int = 10, max_retries: int = 3,
+                 backoff_factor: float = 0.5, timeout: Optional[float] = 30,
+                 cache: Optional[RangeQueryCache] = None):
+        """
+        Initialize the PrometheusQuery client.
+        
+        All queries share one pooled keep-alive session, so repeated queries reuse connections
+        instead of paying a TCP/TLS handshake each time.
+        
+        Args:
+            base_url (str): The base URL of your Prometheus server (e.g., 'http://localhost:9090')
+            pool_size (int): Maximum number of connections kept open to the server
+            max_retries (int): Number of retries on 429/502/503/504 responses and connection errors
+            backoff_factor (float): Exponential backoff factor between retries, in seconds
+            timeout (float, optional): Per-request timeout in seconds, None to wait forever
+            cache (RangeQueryCache, optional): Block cache used by query_range_cached
+        """
+        self.base_url = base_url.rstrip('/')
+        self.api_url = f"{self.base_url}/api/v1"
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.cache = cache
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self) -> None:
+        """Close the underlying session and its pooled connections."""
+        self.session.close()
+
     def query(self, query: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Execute an instant query against Prometheus.
@@ -65,7 +851,7 @@ class PrometheusQuery:
             
         try:
             # Let requests handle the URL encoding
-            response = requests.get(endpoint, params=default_params)
+            response = self.session.get(endpoint, params=default_params, timeout=self.timeout)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -99,36 +885,437 @@ class PrometheusQuery:
             
         try:
             # Let requests handle the URL encoding
-            response = requests.get(endpoint, params=default_params)
+            response = self.session.get(endpoint, params=default_params, timeout=self.timeout)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             raise Exception(f"Failed to execute range query: {str(e)}")
 
+    def _stream_items(self, endpoint: str, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Issue a GET request and incrementally decode the result items of the response body."""
+        try:
+            with self.session.get(endpoint, params=params, timeout=self.timeout, stream=True) as response:
+                # Bad queries come back as 400/422 with a JSON error body, which the decoder reports
+                if response.status_code not in (400, 422):
+                    response.raise_for_status()
+                yield from iter_result_items(response.iter_content(chunk_size=1 << 16))
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to execute streaming query: {str(e)}")
+
+    def query_stream(self, query: str, params: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[Dict[str, str], Any, Any]]:
+        """
+        Execute an instant query and yield each series as NumPy arrays while the response streams in.
+        
+        Args:
+            query (str): The PromQL query to execute
+            params (dict, optional): Additional query parameters
+            
+        Yields:
+            tuple: (metric labels, float64 timestamps, float64 values) per series
+        """
+        self._validate_query(query)
+        default_params = {'query': query}
+        if params:
+            default_params.update(params)
+        for item in self._stream_items(f"{self.api_url}/query", default_params):
+            yield item_to_arrays(item)
+
+    def query_range_stream(self, query: str, start: datetime, end: datetime, step: str = '1m',
+                           params: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[Dict[str, str], Any, Any]]:
+        """
+        Execute a range query and yield each series as NumPy arrays while the response streams in.
+        
+        Peak memory scales with the largest single series rather than the whole response.
+        
+        Args:
+            query (str): The PromQL query to execute
+            start (datetime): Start time for the query range
+            end (datetime): End time for the query range
+            step (str): Query resolution step width (e.g., '1m', '5m', '1h')
+            params (dict, optional): Additional query parameters
+            
+        Yields:
+            tuple: (metric labels, float64 timestamps, float64 values) per series
+        """
+        self._validate_query(query)
+        default_params = {
+            'query': query,
+            'start': start.timestamp(),
+            'end': end.timestamp(),
+            'step': step
+        }
+        if params:
+            default_params.update(params)
+        for item in self._stream_items(f"{self.api_url}/query_range", default_params):
+            yield item_to_arrays(item)
+
+    def query_range_chunked(self, query: str, start: datetime, end: datetime, step: str = '1m',
+                            params: Optional[Dict[str, Any]] = None, parallel: int = 4,
+                            max_points: int = MAX_POINTS_PER_SERIES) -> Dict[str, Any]:
+        """
+        Execute a range query split into step-aligned sub-windows fetched concurrently.
+        
+        Use this for ranges that exceed Prometheus' points-per-series limit (e.g., 30 days at a 15s step).
+        
+        Args:
+            query (str): The PromQL query to execute
+            start (datetime): Start time for the query range
+            end (datetime): End time for the query range
+            step (str): Query resolution step width (e.g., '15s', '1m', '1h')
+            params (dict, optional): Additional query parameters
+            parallel (int): Maximum number of sub-window requests in flight, capped at the pool size
+            max_points (int): Maximum number of points per series in one sub-window
+            
+        Returns:
+            dict: The stitched query response, shaped like a regular range query response
+        """
+        self._validate_query(query)
+        step_seconds = parse_step(step)
+        windows = split_range(start.timestamp(), end.timestamp(), step_seconds, max_points)
+
+        def fetch(window: Tuple[float, float]) -> Dict[str, Any]:
+            return self.query_range(query, datetime.fromtimestamp(window[0], tz=timezone.utc),
+                                    datetime.fromtimestamp(window[1], tz=timezone.utc), step=step, params=params)
+
+        workers = max(1, min(parallel, len(windows), self.pool_size))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map() keeps the responses in window order, which the merge relies on
+            responses = list(executor.map(fetch, windows))
+
+        return merge_matrix_results(responses)
+
+    def query_range_cached(self, query: str, start: datetime, end: datetime, step: str = '1m',
+                           params: Optional[Dict[str, Any]] = None, parallel: int = 4) -> Dict[str, Any]:
+        """
+        Execute a range query, serving completed historical blocks from the on-disk cache.
+        
+        The range is snapped to an absolute step grid (timestamps that are multiples of step) so that
+        overlapping windows share blocks. Only blocks missing from the cache and the recent tail are
+        requested from Prometheus, concurrently. Falls back to query_range_chunked when no cache is set.
+        
+        Args:
+            query (str): The PromQL query to execute
+            start (datetime): Start time for the query range
+            end (datetime): End time for the query range
+            step (str): Query resolution step width (e.g., '15s', '1m', '1h')
+            params (dict, optional): Additional query parameters
+            parallel (int): Maximum number of block requests in flight, capped at the pool size
+            
+        Returns:
+            dict: The stitched query response, shaped like a regular range query response
+        """
+        if self.cache is None:
+            return self.query_range_chunked(query, start, end, step=step, params=params, parallel=parallel)
+
+        self._validate_query(query)
+        step_seconds = parse_step(step)
+        range_start = math.ceil(start.timestamp() / step_seconds) * step_seconds
+        range_end = math.floor(end.timestamp() / step_seconds) * step_seconds
+        block_span = step_seconds * self.cache.block_points
+        settled_before = time.time() - self.cache.settle
+
+        # Each entry is (block_start, fetch_start, fetch_end, cacheable)
+        blocks = []
+        if range_end >= range_start:
+            for index in range(int(range_start // block_span), int(range_end // block_span) + 1):
+                block_start = index * block_span
+                block_end = block_start + block_span - step_seconds
+                if block_end <= settled_before:
+                    blocks.append((block_start, block_start, block_end, True))
+                else:
+                    blocks.append((block_start, max(block_start, range_start), min(block_end, range_end), False))
+
+        responses: List[Optional[Dict[str, Any]]] = [
+            self.cache.get(query, step_seconds, block[0], params, source=self.base_url) if block[3] else None
+            for block in blocks
+        ]
+        missing = [i for i, response in enumerate(responses) if response is None]
+
+        def fetch(i: int) -> Dict[str, Any]:
+            block_start, fetch_start, fetch_end, cacheable = blocks[i]
+            response = self.query_range(query, datetime.fromtimestamp(fetch_start, tz=timezone.utc),
+                                        datetime.fromtimestamp(fetch_end, tz=timezone.utc),
+                                        step=step, params=params)
+            if cacheable and response.get('status') == 'success':
+                self.cache.put(query, step_seconds, block_start, response, params, source=self.base_url)
+            return response
+
+        if missing:
+            workers = max(1, min(parallel, len(missing), self.pool_size))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for i, response in zip(missing, executor.map(fetch, missing)):
+                    responses[i] = response
+
+        return merge_matrix_results([clip_matrix_result(r, range_start, range_end) for r in responses])
+
+def add_cluster_label(response: Dict[str, Any], cluster: str, label: str = 'cluster') -> List[Dict[str, Any]]:
+    """
+    Return the result items of a response with a cluster label added to every series.
+    
+    An existing label of the same name is kept as exported_<label>, like Prometheus federation does.
+    Scalar and string results become a single vector sample with only the cluster label.
+    """
+    data = response.get('data', {})
+    items = data.get('result', [])
+    if data.get('resultType') in ('scalar', 'string'):
+        items = [{'metric': {}, 'value': items}]
+    labelled = []
+    for item in items:
+        metric = dict(item.get('metric', {}))
+        if label in metric:
+            metric[f"exported_{label}"] = metric[label]
+        metric[label] = cluster
+        labelled.append({**item, 'metric': metric})
+    return labelled
+
+class FederatedPrometheusQuery(PrometheusQueryBase):
+    """
+    Send every query to several Prometheus servers (one per cluster) in parallel and merge the results.
+    
+    Each series gets a 'cluster' label naming the shard it came from. A failing shard does not fail
+    the query as long as one shard answers; its error is reported in 'warnings' and in the per-shard
+    'shards' entry of the response, which also records each shard's latency. Requests go through one
+    PrometheusQuery client per shard; only the shard-independent methods of PrometheusQueryBase are
+    inherited.
+    """
+
+    def __init__(self, shards: Dict[str, str], pool_size: int = 10, max_retries: int = 3,
+                 backoff_factor: float = 0.5, timeout: Optional[float] = 30,
+                 cache: Optional[RangeQueryCache] = None, label: str = 'cluster'):
+        """
+        Initialize the federated client.
+        
+        Args:
+            shards (dict): Cluster name to Prometheus base URL (e.g., {'cluster-a': 'http://prom-a:9090'})
+            pool_size (int): Maximum number of connections kept open to each shard
+            max_retries (int): Number of retries per shard request
+            backoff_factor (float): Exponential backoff factor between retries, in seconds
+            timeout (float, optional): Per-request timeout in seconds, bounds how long a slow shard can stall a query
+            cache (RangeQueryCache, optional): Block cache shared by all shards (entries are keyed per shard)
+            label (str): Name of the label added to every series
+        """
+        if not shards:
+            raise ValueError("At least one shard is required")
+        self.shards = {
+            name: PrometheusQuery(url, pool_size=pool_size, max_retries=max_retries,
+                                  backoff_factor=backoff_factor, timeout=timeout, cache=cache)
+            for name, url in shards.items()
+        }
+        self.label = label
+        self.base_url = ','.join(shard.base_url for shard in self.shards.values())
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.cache = cache
+
+    def close(self) -> None:
+        """Close the sessions of all shards."""
+        for shard in self.shards.values():
+            shard.close()
+
+    def _fan_out(self, method: str, *args, **kwargs) -> Dict[str, Any]:
+        """Call the same PrometheusQuery method on every shard concurrently and merge the responses."""
+        def run(name: str) -> Dict[str, Any]:
+            started = time.perf_counter()
+            try:
+                response = getattr(self.shards[name], method)(*args, **kwargs)
+                outcome = {'status': 'success', 'response': response}
+            except Exception as e:
+                outcome = {'status': 'error', 'error': str(e)}
+            outcome['latency_seconds'] = round(time.perf_counter() - started, 6)
+            return outcome
+
+        names = list(self.shards)
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            outcomes = dict(zip(names, executor.map(run, names)))
+
+        result = []
+        result_type = None
+        warnings = []
+        shards = []
+        for name, outcome in outcomes.items():
+            shards.append({'cluster': name, 'url': self.shards[name].base_url, 'status': outcome['status'],
+                           'latency_seconds': outcome['latency_seconds'], 'error': outcome.get('error')})
+            if outcome['status'] == 'error':
+                warnings.append(f"{self.label} {name}: {outcome['error']}")
+                continue
+            response = outcome['response']
+            warnings.extend(f"{self.label} {name}: {warning}" for warning in response.get('warnings', []))
+            shard_type = response.get('data', {}).get('resultType')
+            result_type = result_type or ('vector' if shard_type in ('scalar', 'string') else shard_type)
+            result.extend(add_cluster_label(response, name, self.label))
+
+        if all(outcome['status'] == 'error' for outcome in outcomes.values()):
+            raise Exception(f"All shards failed: {'; '.join(warnings)}")
+        merged = {'status': 'success', 'data': {'resultType': result_type, 'result': result}, 'shards': shards}
+        if warnings:
+            merged['warnings'] = warnings
+        return merged
+
+    def query(self, query: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execute an instant query on every shard (see PrometheusQuery.query)."""
+        self._validate_query(query)
+        return self._fan_out('query', query, params=params)
+
+    def query_range(self, query: str, start: datetime, end: datetime,
+                    step: str = '1m', params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execute a range query on every shard (see PrometheusQuery.query_range)."""
+        self._validate_query(query)
+        return self._fan_out('query_range', query, start, end, step=step, params=params)
+
+    def query_range_chunked(self, query: str, start: datetime, end: datetime, step: str = '1m',
+                            params: Optional[Dict[str, Any]] = None, parallel: int = 4,
+                            max_points: int = MAX_POINTS_PER_SERIES) -> Dict[str, Any]:
+        """Execute a chunked range query on every shard (see PrometheusQuery.query_range_chunked)."""
+        self._validate_query(query)
+        return self._fan_out('query_range_chunked', query, start, end, step=step, params=params,
+                             parallel=parallel, max_points=max_points)
+
+    def query_range_cached(self, query: str, start: datetime, end: datetime, step: str = '1m',
+                           params: Optional[Dict[str, Any]] = None, parallel: int = 4) -> Dict[str, Any]:
+        """Execute a cached range query on every shard (see PrometheusQuery.query_range_cached)."""
+        self._validate_query(query)
+        return self._fan_out('query_range_cached', query, start, end, step=step, params=params, parallel=parallel)
+
+    def query_stream(self, query: str, params: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[Dict[str, str], Any, Any]]:
+        """Yield the merged instant query series as NumPy arrays (the shard responses are not streamed)."""
+        for item in self.query(query, params=params)['data']['result']:
+            yield item_to_arrays(item)
+
+    def query_range_stream(self, query: str, start: datetime, end: datetime, step: str = '1m',
+                           params: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[Dict[str, str], Any, Any]]:
+        """Yield the merged range query series as NumPy arrays (the shard responses are not streamed)."""
+        for item in self.query_range(query, start, end, step=step, params=params)['data']['result']:
+            yield item_to_arrays(item)
+
 def parse_args():
     parser = argparse.ArgumentParser(description='Query Prometheus API')
-    parser.add_argument('--query', type=str, required=True, help='PromQL query to execute')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--query', type=str, help='PromQL query to execute')
+    source.add_argument('--queries-file', type=str, help='Run every query in a YAML or JSONL file concurrently and write one combined result file to /tmp')
+    parser.add_argument('--watch', type=float, metavar='INTERVAL', help='Re-run the instant query every INTERVAL seconds and print only series whose value changed')
+    parser.add_argument('--concurrency', type=int, default=8, help='Number of queries in flight when using --queries-file')
     parser.add_argument('--url', type=str, default='http://localhost:9090', help='Prometheus server URL')
-    parser.add_argument('--range', action='store_true', help='Execute a range query instead of an instant query')
+    parser.add_argument('--shard', action='append', metavar='NAME=URL', help='Query several Prometheus servers in parallel and merge the results with a cluster=NAME label (repeatable, overrides --url)')
+    parser.add_argument('--range', action='store_true', help='Execute a range query instead of an instant query. With the block cache (the default) sample timestamps are aligned to multiples of --step; use --no-cache for a grid that starts at --start')
     parser.add_argument('--start', type=str, help='Start time for range query (ISO format, e.g., 2023-01-01T00:00:00Z)')
     parser.add_argument('--end', type=str, help='End time for range query (ISO format, e.g., 2023-01-01T01:00:00Z)')
     parser.add_argument('--step', type=str, default='1m', help='Step width for range query (e.g., 1m, 5m, 1h)')
+    parser.add_argument('--max-points', type=int, help='Pick the finest step that keeps each series under this many points (overrides --step)')
+    parser.add_argument('--over-time', choices=OVER_TIME_FUNCTIONS, help='Wrap the range query in <func>_over_time over each step so Prometheus aggregates server-side')
+    parser.add_argument('--summary', action='store_true', help='Print min/max/mean/p50/p95/p99 per series instead of the raw samples (requires numpy)')
+    parser.add_argument('--chunk', action='store_true', help=f'Split the range query into sub-windows of at most {MAX_POINTS_PER_SERIES} points and fetch them concurrently (requires --no-cache; the block cache already fetches missing blocks concurrently)')
+    parser.add_argument('--parallel', type=int, default=4, help='Number of concurrent sub-window requests when using --chunk, or block requests when using the cache')
+    parser.add_argument('--no-cache', action='store_true', help='Fetch the whole range from Prometheus instead of using the on-disk block cache')
+    parser.add_argument('--cache-dir', type=str, help='Directory for the range query cache (default: ~/.cache/prometheus_query)')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+    parser.add_argument('--retries', type=int, default=3, help='Retries with backoff on 429/503 responses and connection errors')
     parser.add_argument('--no-color', action='store_true', help='Disable syntax highlighting')
+    parser.add_argument('--plain', action='store_true', help='Print one line per sample instead of JSON (fastest for large results)')
     parser.add_argument('--export', action='store_true', help='Export the query result to a JSON file in /tmp folder')
-    return parser.parse_args()
+    parser.add_argument('--format', choices=['json'] + sorted(EXPORTERS), default='json',
+                        help='Output format. Non-JSON formats stream the response series by series into a columnar file in /tmp '
+                             '(range queries only stream with --no-cache and without --chunk)')
+    args = parser.parse_args()
+    if not args.range:
+        used = [flag for flag, value in (('--max-points', args.max_points), ('--over-time', args.over_time),
+                                         ('--summary', args.summary)) if value]
+        if used:
+            parser.error(f"{', '.join(used)} only apply to range queries; add --range")
+    if args.chunk and not args.no_cache:
+        parser.error("--chunk requires --no-cache; the block cache already fetches missing blocks concurrently")
+    return args
+
+def run_batch(prom: PrometheusQueryBase, args: argparse.Namespace) -> None:
+    """Run the --queries-file batch, print per-query latency and export the combined results."""
+    queries = load_queries_file(args.queries_file, range_query=args.range, start=args.start, end=args.end, step=args.step)
+    print(f"\nRunning {len(queries)} queries from {args.queries_file} (concurrency {args.concurrency})")
+
+    started = time.perf_counter()
+    results = prom.query_batch(queries, concurrency=args.concurrency, parallel=args.parallel)
+    wall_time = time.perf_counter() - started
+
+    print("\nLatency per query:")
+    for outcome in sorted(results, key=lambda r: r['latency_seconds'], reverse=True):
+        detail = f" ({outcome['error']})" if outcome['status'] == 'error' else ''
+        print(f"  {outcome['latency_seconds']:8.3f}s  {outcome['status']:<7}  {outcome['name']}{detail}")
+    failed = sum(1 for outcome in results if outcome['status'] == 'error')
+    total = sum(outcome['latency_seconds'] for outcome in results)
+    print(f"\n{len(results) - failed} succeeded, {failed} failed in {wall_time:.3f}s wall time "
+          f"({total:.3f}s if run sequentially)")
+
+    # Generate filename with HH-MM-SS_DD-MM-YY.json format
+    timestamp = datetime.now().strftime("%H-%M-%S_%d-%m-%y")
+    filename = f"/tmp/prometheus_batch_{timestamp}.json"
+    with open(filename, 'w') as f:
+        json.dump({'wall_time_seconds': round(wall_time, 6), 'queries': results}, f)
+    print(f"\nBatch results exported to: {filename}")
+
+def run_watch(prom: PrometheusQueryBase, args: argparse.Namespace) -> None:
+    """Run --watch mode, printing one line per changed series until interrupted."""
+    print(f"Watching {args.query} every {args.watch}s (Ctrl-C to stop)")
+    try:
+        for changes in prom.watch(args.query, args.watch):
+            now = datetime.now().strftime("%H:%M:%S")
+            for change in changes:
+                if change['change'] == 'error':
+                    print(f"{now} error {change['error']}")
+                    continue
+                name = format_metric(change['metric'])
+                if change['change'] == 'new':
+                    print(f"{now} + {name} {change['value']:g}")
+                elif change['change'] == 'gone':
+                    print(f"{now} - {name} (was {change['previous']:g})")
+                else:
+                    delta = change['value'] - change['previous']
+                    rate = f", {change['rate']:+g}/s" if change['rate'] is not None else ''
+                    print(f"{now} ~ {name} {change['value']:g} ({delta:+g}{rate})")
+    except KeyboardInterrupt:
+        pass
 
 def main():
     args = parse_args()
-    prom = PrometheusQuery(args.url)
+    cache = RangeQueryCache(args.cache_dir) if (args.range or args.queries_file) and not args.no_cache else None
+    pool_size = max(10, args.parallel, args.concurrency)
+    if args.shard:
+        if not all('=' in shard for shard in args.shard):
+            raise ValueError("--shard must be given as NAME=URL")
+        shards = dict(shard.split('=', 1) for shard in args.shard)
+        prom = FederatedPrometheusQuery(shards, pool_size=pool_size, max_retries=args.retries, timeout=args.timeout, cache=cache)
+    else:
+        prom = PrometheusQuery(args.url, pool_size=pool_size, max_retries=args.retries, timeout=args.timeout, cache=cache)
+    columnar = args.format != 'json' and not args.summary
+    result = None
+    series = None
     
     try:
+        if args.queries_file:
+            run_batch(prom, args)
+            return
+        if args.watch:
+            run_watch(prom, args)
+            return
+
         if args.range:
             # Parse start and end times
-            start_time = datetime.fromisoformat(args.start.replace('Z', '+00:00')) if args.start else datetime.now() - timedelta(hours=1)
-            end_time = datetime.fromisoformat(args.end.replace('Z', '+00:00')) if args.end else datetime.now()
+            start_time = parse_time(args.start, datetime.now() - timedelta(hours=1))
+            end_time = parse_time(args.end, datetime.now())
+            if args.max_points:
+                args.step = choose_step(start_time, end_time, args.max_points)
+            if args.over_time:
+                args.query = over_time_query(args.query, args.over_time, args.step)
             
-            result = prom.query_range(args.query, start_time, end_time, step=args.step)
+            if columnar and prom.cache is None and not args.chunk:
+                series = prom.query_range_stream(args.query, start_time, end_time, step=args.step)
+            elif prom.cache is not None:
+                result = prom.query_range_cached(args.query, start_time, end_time, step=args.step, parallel=args.parallel)
+            elif args.chunk:
+                result = prom.query_range_chunked(args.query, start_time, end_time, step=args.step, parallel=args.parallel)
+            else:
+                result = prom.query_range(args.query, start_time, end_time, step=args.step)
             print("\nRange Query Result:")
+        elif columnar:
+            series = prom.query_stream(args.query)
+            print("\nInstant Query Result:")
         else:
             result = prom.query(args.query)
             print("\nInstant Query Result:")
@@ -140,15 +1327,50 @@ def main():
             print(f"Start Time: {start_time.isoformat()}")
             print(f"End Time: {end_time.isoformat()}")
             print(f"Step: {args.step}")
+            if prom.cache is not None:
+                print(f"Cache: {prom.cache.cache_dir}")
+            elif args.chunk:
+                print(f"Chunked: up to {args.parallel} parallel requests")
+        if result is not None and 'shards' in result:
+            print("Shards:")
+            for shard in result['shards']:
+                error = f" ({shard['error']})" if shard['error'] else ''
+                print(f"  {shard['cluster']}: {shard['status']} in {shard['latency_seconds']:.3f}s{error}")
         
+        if args.summary:
+            print("\nSummary:")
+            for summary in summarize_series(result['data']['result']):
+                stats = '  '.join(f"{k}={v:g}" for k, v in summary.items() if k not in ('metric', 'samples') and v is not None)
+                print(f"  {format_metric(summary['metric'])}  samples={summary['samples']}  {stats}")
+            return
+
+        if columnar:
+            if series is None:
+                series = (item_to_arrays(item) for item in result['data']['result'])
+            timestamp = datetime.now().strftime("%H-%M-%S_%d-%m-%y")
+            filename = f"/tmp/prometheus_query_{timestamp}.{args.format}"
+            count = EXPORTERS[args.format](series, filename)
+            print(f"\nExported {count} series to: {filename}")
+            return
+
         # Display result with syntax highlighting
         print("\nResult:")
-        json_str = json.dumps(result, indent=2)
-        if not args.no_color:
-            highlighted_json = highlight(json_str, JsonLexer(), TerminalFormatter())
-            print(highlighted_json)
+        if args.plain:
+            render_plain(result)
+        elif args.no_color:
+            # Encode straight to stdout instead of building the whole string first
+            json.dump(result, sys.stdout, indent=2)
+            print()
         else:
-            print(json_str)
+            json_str = json.dumps(result, indent=2)
+            if len(json_str) > HIGHLIGHT_MAX_BYTES:
+                print(json_str)
+            else:
+                from pygments import highlight
+                from pygments.lexers import JsonLexer
+                from pygments.formatters import TerminalFormatter
+                highlighted_json = highlight(json_str, JsonLexer(), TerminalFormatter())
+                print(highlighted_json)
         
         # Export the result to a JSON file if requested
         if args.export:
@@ -162,6 +1384,9 @@ def main():
             print(f"\nQuery result exported to: {filename}")
     except Exception as e:
         print(f"Error executing query: {e}")
+        sys.exit(1)
+    finally:
+        prom.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
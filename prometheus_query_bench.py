@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# pip install requests, pygments (same as prometheus_query.py)
+# python3 prometheus_query_bench.py --series 500 --points 2000 --requests 200 --concurrency 8 --output /tmp/prometheus_bench.json
+# python3 prometheus_query_bench.py --startup-only --max-import-ms 30
+#
+# Benchmarks prometheus_query.py against a local stand-in Prometheus that serves synthetic series
+# over /api/v1/query and /api/v1/query_range, and prints the results as JSON.
+import argparse
+import glob
+import importlib.util
+import json
+import math
+import re
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Any, List
+import urllib.parse as urlparse
+
+from bench_common import FakeHandler, FakeHTTPServer, percentiles
+from prometheus_query import PrometheusQuery, parse_step
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prometheus_query.py')
+
+# Files prometheus_query.py writes for --export and --format
+CLI_EXPORT_GLOB = '/tmp/prometheus_query_*'
+
+# Optional dependencies that must only be imported when a run actually needs them
+LAZY_MODULES = ('pygments', 'numpy', 'pyarrow', 'yaml')
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class FakePrometheus:
+    """Synthetic Prometheus API server with a fixed number of series per query."""
+
+    def __init__(self, series: int, port: int = 0):
+        self.series = series
+        self.bytes_sent = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = FakeHTTPServer(('127.0.0.1', port), self._handler_class())
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self) -> 'FakePrometheus':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _metric(self, i: int) -> Dict[str, str]:
+        return {
+            '__name__': 'runai_gpu_memory_used_mebibytes_per_workload',
+            'workload_name': f"workload-{i:05d}",
+            'namespace': f"runai-project-{i % 20}",
+            'gpu': str(i % 8)
+        }
+
+    @staticmethod
+    def _value(i: int, ts: float) -> str:
+        return repr(round(1000 + 500 * math.sin(ts / 600 + i), 3))
+
+    def instant_body(self, ts: float) -> bytes:
+        result = [{'metric': self._metric(i), 'value': [ts, self._value(i, ts)]} for i in range(self.series)]
+        return json.dumps({'status': 'success', 'data': {'resultType': 'vector', 'result': result}}).encode('utf-8')
+
+    def range_body(self, start: float, end: float, step: float) -> bytes:
+        count = int((end - start) // step) + 1 if end >= start else 0
+        timestamps = [start + k * step for k in range(count)]
+        result = [
+            {'metric': self._metric(i), 'values': [[ts, self._value(i, ts)] for ts in timestamps]}
+            for i in range(self.series)
+        ]
+        return json.dumps({'status': 'success', 'data': {'resultType': 'matrix', 'result': result}}).encode('utf-8')
+
+    def _handler_class(self):
+        fake = self
+        # Identical requests (same time window) are served from memory so the server is not the bottleneck
+        instant_body = lru_cache(maxsize=64)(fake.instant_body)
+        range_body = lru_cache(maxsize=64)(fake.range_body)
+
+        class Handler(FakeHandler):
+            def do_GET(self):
+                parsed = urlparse.urlparse(self.path)
+                params = {k: v[0] for k, v in urlparse.parse_qs(parsed.query).items()}
+                if parsed.path == '/api/v1/query':
+                    body = instant_body(float(params.get('time', 1700000000)))
+                elif parsed.path == '/api/v1/query_range':
+                    body = range_body(float(params['start']), float(params['end']), parse_step(params['step']))
+                else:
+                    self.send_body(404, b'{"status":"error","errorType":"not_found","error":"unknown endpoint"}')
+                    return
+
+                self.send_body(200, body)
+                with fake._lock:
+                    fake.bytes_sent += len(body)
+                    fake.requests += 1
+
+        return Handler
+
+
+def bench_client(fake: FakePrometheus, kind: str, requests_count: int, concurrency: int,
+                 start: datetime, end: datetime, step: str) -> Dict[str, Any]:
+    """Measure PrometheusQuery throughput, latency, bytes/sec and peak Python heap for one query kind."""
+    entries = [{'query': 'runai_gpu_memory_used_mebibytes_per_workload', 'range': kind == 'range',
+                'start': start, 'end': end, 'step': step}] * requests_count
+    bytes_before = fake.bytes_sent
+    with PrometheusQuery(fake.url, pool_size=concurrency) as prom:
+        # Warm the pool and the server's response cache
+        prom.query_batch(entries[:concurrency], concurrency=concurrency)
+        bytes_before = fake.bytes_sent
+        tracemalloc.start()
+        started = time.perf_counter()
+        results = prom.query_batch(entries, concurrency=concurrency)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    failed = [r for r in results if r['status'] != 'success']
+    transferred = fake.bytes_sent - bytes_before
+    return {
+        'kind': kind,
+        'requests': requests_count,
+        'concurrency': concurrency,
+        'errors': len(failed),
+        'seconds': round(elapsed, 6),
+        'queries_per_sec': round(requests_count / elapsed, 3),
+        'bytes_per_sec': round(transferred / elapsed, 1),
+        'response_bytes': transferred // max(1, requests_count),
+        'latency': percentiles([r['latency_seconds'] for r in results]),
+        'peak_python_heap_bytes': peak
+    }
+
+
+def bench_cli(fake: FakePrometheus, name: str, extra_args: List[str], runs: int) -> Dict[str, Any]:
+    """Measure wall time and peak RSS of prometheus_query.py invocations in a subprocess.
+
+    Files the runs export to /tmp (--export, --format) are deleted afterwards.
+    """
+    wall_times = []
+    peak_rss = 0
+    existing = set(glob.glob(CLI_EXPORT_GLOB))
+    try:
+        for _ in range(runs):
+            command = [sys.executable, SCRIPT_PATH, '--url', fake.url,
+                       '--query', 'runai_gpu_memory_used_mebibytes_per_workload'] + extra_args
+            started = time.perf_counter()
+            process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            _, status, usage = os.wait4(process.pid, 0)
+            wall_times.append(time.perf_counter() - started)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            if process.returncode != 0:
+                raise Exception(f"CLI run '{name}' exited with status {process.returncode}")
+            # ru_maxrss is in KiB on Linux and bytes on macOS
+            peak_rss = max(peak_rss, usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024))
+    finally:
+        for path in set(glob.glob(CLI_EXPORT_GLOB)) - existing:
+            os.remove(path)
+    return {
+        'name': name,
+        'args': extra_args,
+        'runs': runs,
+        'latency': percentiles(wall_times),
+        'peak_rss_bytes': peak_rss
+    }
+
+
+def bench_startup(runs: int, max_import_ms: float) -> Dict[str, Any]:
+    """
+    Measure the import cost of prometheus_query with -X importtime.
+    
+    own_import_ms excludes requests, which every query needs anyway, so it tracks what the script
+    itself adds to startup. The best of several runs is reported to filter out cold caches.
+    """
+    best: Dict[str, float] = {}
+    loaded = set()
+    for _ in range(runs):
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import prometheus_query'],
+                                 cwd=os.path.dirname(SCRIPT_PATH), capture_output=True, text=True, check=True)
+        cumulative = {}
+        for line in process.stderr.splitlines():
+            match = _IMPORTTIME_RE.match(line)
+            if match:
+                cumulative[match.group(4)] = int(match.group(2)) / 1000
+                loaded.add(match.group(4).split('.')[0])
+        for name in ('prometheus_query', 'requests'):
+            best[name] = min(best.get(name, float('inf')), cumulative.get(name, 0.0))
+
+    own_ms = round(best['prometheus_query'] - best['requests'], 3)
+    return {
+        'runs': runs,
+        'total_import_ms': round(best['prometheus_query'], 3),
+        'requests_import_ms': round(best['requests'], 3),
+        'own_import_ms': own_ms,
+        'budget_ms': max_import_ms,
+        'within_budget': own_ms <= max_import_ms,
+        'eager_optional_imports': sorted(m for m in LAZY_MODULES if m in loaded)
+    }
+
+
+def report(results: Dict[str, Any], filename: str = None) -> None:
+    """Print the results as JSON and optionally write them to a file."""
+    output = json.dumps(results, indent=2)
+    print(output)
+    if filename:
+        with open(filename, 'w') as f:
+            f.write(output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark prometheus_query.py against a local fake Prometheus')
+    parser.add_argument('--series', type=int, default=200, help='Number of series returned by every query')
+    parser.add_argument('--points', type=int, default=1000, help='Points per series in range queries')
+    parser.add_argument('--requests', type=int, default=200, help='Number of client queries per benchmark')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client queries')
+    parser.add_argument('--cli-runs', type=int, default=5, help='Number of CLI invocations per output mode (0 to skip)')
+    parser.add_argument('--startup-runs', type=int, default=5, help='Number of -X importtime runs')
+    parser.add_argument('--max-import-ms', type=float, default=30, help='Import time budget for prometheus_query itself, excluding requests')
+    parser.add_argument('--startup-only', action='store_true', help='Only run the import time check')
+    parser.add_argument('--output', type=str, help='Also write the JSON results to this file')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    step = '15s'
+    end = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    start = end - timedelta(seconds=15 * (args.points - 1))
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'config': vars(args),
+        'startup': bench_startup(args.startup_runs, args.max_import_ms),
+        'cli': [],
+        'client': []
+    }
+    startup_ok = results['startup']['within_budget'] and not results['startup']['eager_optional_imports']
+    if args.startup_only:
+        report(results, args.output)
+        sys.exit(0 if startup_ok else 1)
+
+    fake = FakePrometheus(args.series).start()
+    try:
+        # Run the CLI first: a child's peak RSS includes the parent's at fork time, so the parent
+        # must still be small
+        if args.cli_runs:
+            range_args = ['--range', '--no-cache', '--start', start.isoformat(), '--end', end.isoformat(), '--step', step]
+            with tempfile.TemporaryDirectory() as cache_dir:
+                modes = [
+                    ('instant-color', []),
+                    ('instant-no-color', ['--no-color']),
+                    ('range-no-color', range_args + ['--no-color']),
+                    ('range-no-color-export', range_args + ['--no-color', '--export']),
+                    ('range-plain', range_args + ['--plain']),
+                    ('range-cached', ['--range', '--cache-dir', cache_dir, '--start', start.isoformat(),
+                                      '--end', end.isoformat(), '--step', step, '--no-color']),
+                ]
+                if importlib.util.find_spec('numpy') is not None:
+                    modes.append(('range-csv', range_args + ['--format', 'csv']))
+                for name, extra_args in modes:
+                    results['cli'].append(bench_cli(fake, name, extra_args, args.cli_runs))
+        for kind in ('instant', 'range'):
+            results['client'].append(bench_client(fake, kind, args.requests, args.concurrency, start, end, step))
+    finally:
+        fake.stop()
+
+    report(results, args.output)
+    sys.exit(0 if startup_ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import pytest
+
+from clearml_api_flow import load_task_manifest
+
+DEFAULTS = {'name': 'job', 'repo': 'https://example.com/repo.git', 'branch': 'main',
+            'entrypoint': 'train.py', 'image': 'python:3.11', 'prerun_script': None}
+
+
+def test_yaml_manifest_fills_defaults(tmp_path):
+    path = tmp_path / 'tasks.yaml'
+    path.write_text("- name: first\n  branch: dev\n- entrypoint: eval.py\n")
+
+    tasks = load_task_manifest(str(path), DEFAULTS)
+
+    assert [task['name'] for task in tasks] == ['first', 'job-0002']
+    assert [task['branch'] for task in tasks] == ['dev', 'main']
+    assert [task['entrypoint'] for task in tasks] == ['train.py', 'eval.py']
+
+
+@pytest.mark.parametrize('content, error', [
+    ("name: first\nbranch: dev\n", r"tasks\.yaml must be a list of task rows, got dict"),
+    ("- name: first\n- just-a-name\n", r"Manifest row 2 in .*tasks\.yaml must be a mapping of fields, got str"),
+])
+def test_yaml_manifest_rejects_rows_that_are_not_mappings(tmp_path, content, error):
+    path = tmp_path / 'tasks.yaml'
+    path.write_text(content)
+
+    with pytest.raises(ValueError, match=error):
+        load_task_manifest(str(path), DEFAULTS)
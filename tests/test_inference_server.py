@@ -0,0 +1,98 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'inference_server.py')
+
+BATCH_BODY = b'[{"word1": "hello", "word2": "hey"}, ["foo", "barbaz"]]'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def server(request):
+    """Start inference_server.py with the arguments given as the fixture's parameter; yield its port."""
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, SCRIPT, '--port', str(port)] + request.param,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline or proc.poll() is not None:
+                proc.kill()
+                pytest.fail('inference_server.py did not start')
+            time.sleep(0.05)
+    yield port
+    proc.terminate()
+    proc.wait(timeout=30)
+
+
+def exchange(port, request):
+    """Send a raw request and read the response until the server closes the connection."""
+    with socket.create_connection(('127.0.0.1', port), timeout=10) as sock:
+        sock.sendall(request)
+        response = b''
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                return response
+            response += data
+
+
+def batch_request(body=BATCH_BODY):
+    return (b'POST /predict/batch HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+            b'Connection: close\r\nContent-Length: %d\r\n\r\n%s' % (len(body), body))
+
+
+@pytest.mark.parametrize('server', [['--mode', 'single']], indirect=True)
+def test_single_mode_batch_response_is_not_chunked(server):
+    head, _, body = exchange(server, batch_request()).partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+
+    assert lines[0] == 'HTTP/1.0 200 OK'
+    assert not any(line.lower().startswith('transfer-encoding') for line in lines)
+    assert json.loads(body) == ["1st word 'hello' has 5 characters, 2nd word 'hey' has 3 characters.",
+                                "1st word 'foo' has 3 characters, 2nd word 'barbaz' has 6 characters."]
+
+
+@pytest.mark.parametrize('server', [['--mode', 'threaded']], indirect=True)
+def test_threaded_mode_batch_response_is_chunked(server):
+    head, _, body = exchange(server, batch_request()).partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+
+    assert lines[0] == 'HTTP/1.1 200 OK'
+    assert 'Transfer-Encoding: chunked' in lines
+    assert body.endswith(b'0\r\n\r\n')
+
+
+@pytest.mark.parametrize('server', [['--mode', 'asyncio', '--busy-ms', '1000']], indirect=True)
+def test_asyncio_mode_serves_other_connections_during_inference(server):
+    body = b'word1=hello&word2=hey'
+    with socket.create_connection(('127.0.0.1', server), timeout=10) as predict:
+        predict.sendall(b'POST /predict HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n'
+                        b'Content-Type: application/x-www-form-urlencoded\r\nContent-Length: %d\r\n\r\n%s'
+                        % (len(body), body))
+        time.sleep(0.1)
+        started = time.perf_counter()
+        response = exchange(server, b'GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n')
+        assert response.startswith(b'HTTP/1.1 200 OK')
+        assert time.perf_counter() - started < 0.5
+
+        prediction = b''
+        while not prediction.endswith(b'characters.'):
+            data = predict.recv(65536)
+            assert data
+            prediction += data
+    assert b"1st word 'hello' has 5 characters" in prediction
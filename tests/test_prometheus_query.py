@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import prometheus_query
+from prometheus_query import FederatedPrometheusQuery, PrometheusQuery, RangeQueryCache, load_queries_file
+from prometheus_query_bench import FakePrometheus
+
+
+def test_queries_file_accepts_unquoted_yaml_timestamps(tmp_path):
+    path = tmp_path / 'queries.yaml'
+    path.write_text(
+        "- name: utc\n"
+        "  query: up\n"
+        "  range: true\n"
+        "  start: 2023-01-01T00:00:00Z\n"
+        "  end: 2023-01-01T01:00:00Z\n"
+        "- name: naive\n"
+        "  query: up\n"
+        "  range: true\n"
+        "  start: 2023-01-01 00:00:00\n"
+        "  end: '2023-01-01T01:00:00Z'\n"
+    )
+    queries = load_queries_file(str(path))
+
+    expected_start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    expected_end = datetime(2023, 1, 1, 1, tzinfo=timezone.utc)
+    for query in queries:
+        assert query['start'] == expected_start
+        assert query['end'] == expected_end
+        assert query['start'].tzinfo is not None
+
+    fake = FakePrometheus(2).start()
+    try:
+        results = PrometheusQuery(fake.url, max_retries=0).query_batch(queries, concurrency=2)
+    finally:
+        fake.stop()
+    assert [result['status'] for result in results] == ['success', 'success']
+
+
+def test_queries_file_rejects_non_timestamp_values(tmp_path):
+    path = tmp_path / 'queries.yaml'
+    path.write_text("- query: up\n  start: 12\n")
+    with pytest.raises(ValueError, match=r"Entry 0 in .*queries\.yaml: 'start' must be an ISO timestamp, got int 12"):
+        load_queries_file(str(path))
+
+
+def test_parse_time_keeps_string_parsing():
+    default = datetime(2020, 1, 1)
+    assert prometheus_query.parse_time('', default) is default
+    assert prometheus_query.parse_time('2023-01-01T00:00:00Z', default) == datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+
+def public_methods(cls):
+    return {name for name in dir(cls) if not name.startswith('_') and callable(getattr(cls, name))}
+
+
+def test_federated_client_covers_every_public_method(tmp_path):
+    assert public_methods(PrometheusQuery) <= public_methods(FederatedPrometheusQuery)
+
+    fakes = [FakePrometheus(2).start(), FakePrometheus(3).start()]
+    shards = {'a': fakes[0].url, 'b': fakes[1].url}
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(hours=1)
+    try:
+        with FederatedPrometheusQuery(shards, max_retries=0, cache=RangeQueryCache(str(tmp_path))) as prom:
+            responses = {
+                'query': prom.query('up'),
+                'query_range': prom.query_range('up', start, end, step='1m'),
+                'query_range_chunked': prom.query_range_chunked('up', start, end, step='1m', max_points=20),
+                'query_range_cached': prom.query_range_cached('up', start, end, step='1m'),
+            }
+            for name, response in responses.items():
+                clusters = sorted(item['metric']['cluster'] for item in response['data']['result'])
+                assert clusters == ['a', 'a', 'b', 'b', 'b'], name
+
+            assert len(list(prom.query_stream('up'))) == 5
+            assert len(list(prom.query_range_stream('up', start, end, step='1m'))) == 5
+            assert len(prom.query_range_summary('up', start, end, max_points=50)) == 5
+            changes = next(prom.watch('up', interval=1, max_ticks=1))
+            assert [change['change'] for change in changes] == ['new'] * 5
+            batch = prom.query_batch([{'query': 'up'}, {'query': 'up', 'range': True, 'start': start, 'end': end}])
+            assert [outcome['status'] for outcome in batch] == ['success', 'success']
+    finally:
+        for fake in fakes:
+            fake.stop()
+
+
+def test_chunk_requires_no_cache(monkeypatch, capsys):
+    monkeypatch.setattr('sys.argv', ['prometheus_query.py', '--query', 'up', '--range', '--chunk'])
+    with pytest.raises(SystemExit) as excinfo:
+        prometheus_query.parse_args()
+    assert excinfo.value.code == 2
+    assert '--chunk requires --no-cache' in capsys.readouterr().err
+
+    monkeypatch.setattr('sys.argv', ['prometheus_query.py', '--query', 'up', '--range', '--chunk', '--no-cache'])
+    assert prometheus_query.parse_args().chunk